@@ -1,12 +1,13 @@
 import numpy as np
 import gizeh as gz
 
-from skimage.transform import resize
 
 import sys
 sys.path.insert(0, '../../tools')
 from rendering import *
 from geometry import *
+from spectrum import *
+from grids import *
 
 
 name = '2d_fft_pulsing_circle'
@@ -26,15 +27,10 @@ def make_frame(t):
               stroke_width=8 + 4*(p[0] + p[1] - p[2] - p[3]),
               stroke=(1,1,1)).draw(surface)
 
-    # FFT
-    I = np.fft.fft2(surface.get_npimage()[:,:,0]/255)
-    I = np.log(np.abs(I) + 0.00001).astype(np.float32)
-    I = 1 - np.minimum(1, np.maximum(0, I))
-    I = resize(I, (width, height))
-
-    # border
+    # FFT with border
     radius = (300 + 15 * (p[0] + p[1] - p[2] - p[3]))
-    I *= get_circle_mask(width, height, radius)
+    I = surface_spectrum(surface, lambda I: 1 - np.minimum(1, np.maximum(0, np.log(I + 0.00001))),
+                         mask=circle_mask(width, height, radius))
     I = np.tile(I[:,:,np.newaxis], (1,1,4)) * 255
     surface = gz.Surface.from_image(I.astype(np.uint8))
     gz.circle(xy=(width/2, height/2), r=radius, stroke=(1,1,1), stroke_width=2).draw(surface)
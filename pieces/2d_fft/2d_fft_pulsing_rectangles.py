@@ -1,12 +1,13 @@
 import numpy as np
 import gizeh as gz
 
-from skimage.transform import resize
 
 import sys
 sys.path.insert(0, '../../tools')
 from rendering import *
 from geometry import *
+from spectrum import *
+from grids import *
 
 
 name = '2d_fft_pulsing_rectangles'
@@ -33,15 +34,10 @@ def make_frame(t):
                      xy=(width, height),
                      fill=(0,0,0)).draw(surface)
 
-    # FFT
-    I = np.fft.fft2(surface.get_npimage()[:,:,0]/255)
-    I = np.abs(I).astype(np.float32)
-    I = 1 - np.minimum(1, np.maximum(0, I))
-    I = resize(I, (width, height))
-
-    # border
+    # FFT with border
     radius = (300 + 15 * (p[0] + p[1] - p[2] - p[3]))
-    I *= get_circle_mask(width, height, radius)
+    I = surface_spectrum(surface, lambda I: 1 - np.minimum(1, np.maximum(0, I)),
+                         mask=circle_mask(width, height, radius))
     I -= np.min(I)
     I /= np.max(I)
 
@@ -1,12 +1,13 @@
 import numpy as np
 import gizeh as gz
 
-from skimage.transform import resize
 
 import sys
 sys.path.insert(0, '../../tools')
 from rendering import *
 from geometry import *
+from spectrum import *
+from grids import *
 
 
 name = '2d_fft_rotating_star'
@@ -30,16 +31,10 @@ def make_frame(t):
     for i in range(n_lines):
         gz.polyline(points=[center, C[i,:]], stroke=(1,1,1), stroke_width=2).draw(surface)
 
-    # FFT
-    I = np.fft.fft2(surface.get_npimage()[:,:,0]/255)
-    I = np.abs(I).astype(np.float32)
-    I -= 1
-    I = 1 - np.minimum(1, np.maximum(0, I))
-    I = resize(I, (width, height))
-
-    # border
+    # FFT with border
     radius = 300
-    I *= get_circle_mask(width, height, radius)
+    I = surface_spectrum(surface, lambda I: 1 - np.minimum(1, np.maximum(0, I - 1)),
+                         mask=circle_mask(width, height, radius))
     I = np.tile(I[:,:,np.newaxis], (1,1,4)) * 255
     surface = gz.Surface.from_image(I.astype(np.uint8))
     gz.circle(xy=(width/2, height/2), r=radius, stroke=(1,1,1), stroke_width=3).draw(surface)
@@ -1,7 +1,6 @@
 import numpy as np
 import gizeh as gz
 
-from skimage.transform import resize
 
 import sys
 sys.path.insert(0, '../../tools')
@@ -25,16 +24,13 @@ def make_frame(t):
     # Overlayed wave patterns
     n = 5+np.sin(p)
     m = 8+np.cos(p)
-    I = get_chladni_pattern(n, m, 2*width, 2*height, lim=1.5)
-    I *= get_chladni_pattern(n, n, 2*width, 2*height, lim=1.5)
+    # float64, the product gets large towards the border and only its fractional part is kept
+    I = get_chladni_pattern(n, m, 2*width, 2*height, lim=1.5, dtype=np.float64)
+    I *= get_chladni_pattern(n, n, 2*width, 2*height, lim=1.5, dtype=np.float64)
     I = I%1.0
-    I = resize(I, (width, height))
 
-    # Border fade
-    I *= mask
-
-    I = np.tile(I[:,:,None], (1,1,3)) * 255
-    return I.astype(np.uint8)
+    # Downsample with border fade
+    return supersampled_frame(I, 2, mask)
 
 
 # Render animation
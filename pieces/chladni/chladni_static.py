@@ -1,7 +1,6 @@
 import numpy as np
 import gizeh as gz
 
-from skimage.transform import resize
 
 import sys
 sys.path.insert(0, '../../tools')
@@ -30,7 +29,7 @@ def make_frame(t):
     I = get_wolfram_chladni_pattern(5, 4, 2*width, 2*height, lim=2.5, xphase=x * 2*np.pi, yphase=y * 2*np.pi)
 
     I = I%1.0
-    I = resize(I, (width, height))
+    I = downsample(I, 2)
     # I = (np.tanh(I*30) + 1) / 2
     # I = np.minimum(1, 1*np.exp(-np.abs(I)))**4
 
@@ -4,6 +4,7 @@ import sys
 sys.path.insert(0, '../../tools')
 from rendering import *
 from geometry import *
+from batch_draw import *
 
 
 name = 'elongated_segments'
@@ -65,8 +66,7 @@ def make_frame(t):
     p2 = points + segment_length * diffs
 
     # draw
-    for i in range(len(points)):
-        gz.polyline(points=[p1[i], p2[i]], stroke=(1,1,1,0.02), stroke_width=1).draw(surface)
+    draw_segments(surface, p1, p2, stroke=(1,1,1,0.02), stroke_width=1)
 
     return surface.get_npimage()
 
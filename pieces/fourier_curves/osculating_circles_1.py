@@ -4,6 +4,7 @@ import sys
 sys.path.insert(0, '../../tools')
 from rendering import *
 from geometry import *
+from batch_draw import *
 
 
 name = 'osculating_circles_1'
@@ -52,13 +53,9 @@ def make_frame(t):
     points = center + s * points.T
 
     # draw
-    for i in range(len(points)):
-        p[0] = points[(i-2) % len(points)]
-        p[1] = points[ i    % len(points)]
-        p[2] = points[(i+2) % len(points)]
-
-        c, r = circle_from_three_points(p[0], p[1], p[2])
-        gz.circle(xy=c, r=r, stroke=(1,1,1,0.01), stroke_width=2).draw(surface)
+    circles = [circle_from_three_points(points[(i-2) % len(points)], points[i], points[(i+2) % len(points)])
+               for i in range(len(points))]
+    draw_circles(surface, [c for c, r in circles], [r for c, r in circles], stroke=(1,1,1,0.01), stroke_width=2)
 
     # outer circle
     gz.circle(xy=center, r=.65 * width, stroke_width=.5 * width, stroke=(0,0,0)).draw(surface)
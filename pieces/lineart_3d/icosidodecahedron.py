@@ -5,6 +5,7 @@ import sys
 sys.path.insert(0, '../../tools')
 from rendering import *
 from project_3d import *
+from lines_3d import *
 from icosphere import *
 
 
@@ -26,29 +27,10 @@ def make_frame(t):
 
     points = np.array(verts_) * 0.5
 
-    # project to screen with rotated camera
+    # project to screen with rotated camera and draw edges sorted by depth
     points = np.concatenate([points, np.ones((len(points),1))], axis=1).T
     C = get_camera_matrix(t_z=np.pi/2 + 1, t_x=-2*np.pi * progress)
-    points, z = project(C, points, (width, height))
-
-    # switch from points to lines
-    lines = np.array([(points[i], points[j]) for (i,j) in index_edges])
-    z_lines = np.array([(z[i] + z[j])/2 for (i,j) in index_edges])
-
-    sort_indices = np.argsort(z_lines)
-    lines = lines[sort_indices]
-    z_lines = z_lines[sort_indices]
-
-    # relative depth for shading
-    z_min, z_max = z_lines.min(), z_lines.max()
-    z_ratios = (z_lines - z_min) / (z_max - z_min)
-
-    # draw lines
-    for i in range(len(lines)):
-        gz.polyline(points=lines[i],
-                    stroke_width=3 + 3 * z_ratios[i],
-                    stroke=[0.3 + 0.7 * z_ratios[i]]*3,
-                    line_cap='round').draw(surface)
+    draw_lines_3d(surface, points, C, (width, height), edges=index_edges)
 
     return surface.get_npimage()
 
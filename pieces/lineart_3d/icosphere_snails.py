@@ -5,6 +5,7 @@ sys.path.insert(0, '../../tools')
 from rendering import *
 from tsp import *
 from project_3d import *
+from lines_3d import *
 from icosphere import *
 
 
@@ -50,44 +51,27 @@ def make_frame(t):
     C = get_camera_matrix(t_z=np.pi/2 + 1, t_x=-2*np.pi * progress)
     points, z = project(C, points, (width, height))
 
-    # switch from points to lines
-    lines = np.array([(points[i], points[(i+1)%len(points)]) for i in range(len(points))])
-    z_lines = np.array([ (z[i] + z[(i+1)%len(z)]) / 2 for i in range(len(z))])
-    # split into even and odd lines
-    l_even = lines[::2]; z_even = z_lines[::2]
-    l_odd = lines[1::2]; z_odd = z_lines[1::2]
-    # sort each by depth
-    i_even = np.argsort(z_even)
-    l_even = l_even[i_even]
-    z_even = z_even[i_even]
-    i_odd = np.argsort(z_odd)
-    l_odd = l_odd[i_odd]
-    z_odd = z_odd[i_odd]
+    # switch from points to even and odd lines, each sorted by depth
+    edges = path_edges(len(points))
+    l_even, z_even, _ = depth_sorted_segments(points, z, edges[::2])
+    l_odd, z_odd, _ = depth_sorted_segments(points, z, edges[1::2])
 
     # relative depth for shading
-    z_min, z_max = z_lines.min(), z_lines.max()
+    z_min, z_max = min(z_even.min(), z_odd.min()), max(z_even.max(), z_odd.max())
     z_middle = (z_min + z_max)/2
     e_ratios = (r + z_even - z_middle) / (2*r)
     o_ratios = (r + z_odd - z_middle) / (2*r)
 
-    # draw lines
-    for i in range(len(l_even)):
-        # even
-        p0, p1 = l_even[i]
-        mid = p0 * (1 - f_even) + p1 * f_even
-        end = p0 if (phase == 1) else p1
-        gz.polyline(points=[mid, end],
-                    stroke_width=(3 + 3 * e_ratios[i]),
-                    stroke=[0.2 + 0.8 * e_ratios[i]]*3,
-                    line_cap='round').draw(surface)
-        # odd
-        p0, p1 = l_odd[i]
-        mid = p0 * (1 - f_odd) + p1 * f_odd
-        end = p0 if (phase == 3) else p1
-        gz.polyline(points=[mid, end],
-                    stroke_width=(3 + 3 * o_ratios[i]),
-                    stroke=[0.2 + 0.8 * o_ratios[i]]*3,
-                    line_cap='round').draw(surface)
+    # partial lines growing from their start or end point
+    mid = l_even[:,0] * (1 - f_even) + l_even[:,1] * f_even
+    l_even = np.stack([mid, l_even[:,0] if (phase == 1) else l_even[:,1]], axis=1)
+    mid = l_odd[:,0] * (1 - f_odd) + l_odd[:,1] * f_odd
+    l_odd = np.stack([mid, l_odd[:,0] if (phase == 3) else l_odd[:,1]], axis=1)
+
+    # draw lines, alternating even and odd
+    lines = np.stack([l_even, l_odd], axis=1).reshape(-1, 2, 2)
+    ratios = np.stack([e_ratios, o_ratios], axis=1).ravel()
+    draw_depth_sorted(surface, lines, ratios, stroke=lambda z: 0.2 + 0.8 * z)
 
     return surface.get_npimage()
 
@@ -5,6 +5,7 @@ import sys
 sys.path.insert(0, '../../tools')
 from rendering import *
 from project_3d import *
+from lines_3d import *
 
 
 name = 'lineart_3d_spiral_ring_1'
@@ -40,27 +41,9 @@ def make_frame(t):
     points[:2,:] += norm(-points_start[:2,:], axis=0) * r * np.cos(base_) * r_weight
     points[:2,:] += norm(-points_start[:2,:], axis=0) * 0.2 * p[-1] * r_weight # correct for radius problem when r = 0
 
-    # project to screen
+    # project to screen and draw lines sorted by depth
     C = get_camera_matrix(t_x=np.pi/4, z=1.2)
-    points, z = project(C, points, (width, height))
-
-    # switch from points to lines and sort by depth
-    lines = np.array([(points[i], points[(i+1)%len(points)]) for i in range(len(points))])
-    z_lines = np.array([ (z[i] + z[(i+1)%len(z)]) / 2 for i in range(len(z))])
-    sort_indices = np.argsort(z_lines)
-    lines = lines[sort_indices]
-    z_lines = z_lines[sort_indices]
-
-    # relative depth for shading
-    z_min, z_max = z_lines.min(), z_lines.max()
-    z_ratios = (z_lines - z_min) / (z_max - z_min)
-
-    # draw lines
-    for i in range(len(lines)):
-        gz.polyline(points=lines[i],
-                    stroke_width=3 + 3 * z_ratios[i],
-                    stroke=[0.3 + 0.7 * z_ratios[i]]*3,
-                    line_cap='round').draw(surface)
+    draw_lines_3d(surface, points, C, (width, height))
 
     return surface.get_npimage()
 
@@ -5,6 +5,7 @@ import sys
 sys.path.insert(0, '../../tools')
 from rendering import *
 from project_3d import *
+from lines_3d import *
 
 
 name = 'lineart_3d_spiral_ring_2'
@@ -52,27 +53,9 @@ def make_frame(t):
     # final points
     points = ring + offset
 
-    # project to screen
+    # project to screen and draw lines sorted by depth
     C = get_camera_matrix(t_x=np.pi/4, t_z=2*np.pi * hermite(progress), z=1.15)
-    points, z = project(C, points, (width, height))
-
-    # switch from points to lines and sort by depth
-    lines = np.array([(points[i], points[(i+1)%len(points)]) for i in range(len(points))])
-    z_lines = np.array([ (z[i] + z[(i+1)%len(z)]) / 2 for i in range(len(z))])
-    sort_indices = np.argsort(z_lines)
-    lines = lines[sort_indices]
-    z_lines = z_lines[sort_indices]
-
-    # relative depth for shading
-    z_min, z_max = z_lines.min(), z_lines.max()
-    z_ratios = (z_lines - z_min) / (z_max - z_min)
-
-    # draw lines
-    for i in range(len(lines)):
-        gz.polyline(points=lines[i],
-                    stroke_width=3 + 3 * z_ratios[i],
-                    stroke=[0.3 + 0.7 * z_ratios[i]]*3,
-                    line_cap='round').draw(surface)
+    draw_lines_3d(surface, points, C, (width, height))
 
     return surface.get_npimage()
 
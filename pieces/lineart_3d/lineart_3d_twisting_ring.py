@@ -5,6 +5,7 @@ import sys
 sys.path.insert(0, '../../tools')
 from rendering import *
 from project_3d import *
+from lines_3d import *
 
 
 name = 'lineart_3d_twisting_ring'
@@ -35,28 +36,9 @@ def make_frame(t):
     points_2 = np.vstack([-x, -y, z, np.ones(base.size)])
     points = np.concatenate([points_1[:,:-1], points_2[:,:-1]], axis=1)
 
-    # project to screen
+    # project to screen and draw lines sorted by depth
     C = get_camera_matrix(t_z=np.pi/4, t_x=2*np.pi * progress)
-    points, z = project(C, points, (width, height))
-
-    # switch from points to lines and sort by depth
-    lines = np.array([(points[i], points[(i+1)%len(points)]) for i in range(len(points))])
-    z_lines = np.array([ (z[i] + z[(i+1)%len(z)]) / 2 for i in range(len(z))])
-    sort_indices = np.argsort(z_lines)
-    lines = lines[sort_indices]
-    z_lines = z_lines[sort_indices]
-
-    # relative depth for shading
-    z_min, z_max = z_lines.min(), z_lines.max()
-    z_middle = (z_min + z_max)/2
-    z_ratios = (r + z_lines - z_middle) / (2*r)
-
-    # draw lines
-    for i in range(len(lines)):
-        gz.polyline(points=lines[i],
-                    stroke_width=3 + 3 * z_ratios[i],
-                    stroke=[0.3 + 0.7 * z_ratios[i]]*3,
-                    line_cap='round').draw(surface)
+    draw_lines_3d(surface, points, C, (width, height), radius=r)
 
     return surface.get_npimage()
 
@@ -3,6 +3,7 @@ import numpy as np
 import sys
 sys.path.insert(0, '../../tools')
 from rendering import *
+from lines_3d import *
 
 
 name = 'lissajous_interpolation'
@@ -36,19 +37,13 @@ def make_frame(t):
     lines.append(lines[0])
     lines = np.array(lines) * 225 + (width/2, height/2, 0)
 
-    weights = equidistant_weight_functions(progress, len(lines), 'hermite')
-    points = np.sum([weights[j] * lines[j] for j in range(len(weights))], axis=0)
+    points = blend_keyframes(progress, lines, 'hermite')
     
     # Switch from points to lines and sort by depth
-    lines = np.array([(points[i,:2], points[(i+1)%len(points),:2]) for i in range(len(points))])
-    z_lines = np.array([(points[i,2] + points[(i+1)%len(points),2]) / 2 for i in range(len(points))])
-    sort_indices = np.argsort(z_lines)
-    lines = lines[sort_indices]
-    z_lines = z_lines[sort_indices]
+    lines, z_lines, _ = depth_sorted_segments(points[:,:2], points[:,2])
 
     # Relative depth for shading
-    z_min, z_max = z_lines.min(), z_lines.max()
-    z_ratios = (z_lines - z_min) / (z_max - z_min)
+    z_ratios = depth_ratios(z_lines)
 
     # Draw lines
     for i in range(len(lines)):
@@ -1,6 +1,5 @@
 import numpy as np
 import gizeh as gz
-from skimage.transform import resize
 
 import sys
 sys.path.insert(0, '../../tools')
@@ -41,7 +40,7 @@ def make_frame(t):
                corners[1,1] * c3)
     I = np.mod(I, modulus)
 
-    I = resize(I, (width, height))
+    I = downsample(I, 2)
     I *= mask
 
     I -= np.min(I)
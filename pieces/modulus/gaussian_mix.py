@@ -1,5 +1,4 @@
 import numpy as np
-from skimage.transform import resize
 
 import sys
 sys.path.insert(0, '../../tools')
@@ -29,12 +28,7 @@ def make_frame(t):
     I *= (1.25 + (1 + p[0] - p[1])*(p[0] - p[2]))
     I = np.mod(I, 1.0)
 
-    I = resize(I, (width, height))
-    I *= mask
-
-    I = np.tile(I[:,:,None], (1,1,3))
-
-    return I * 255
+    return supersampled_frame(I, 2, mask)
 
 
 # Render animation
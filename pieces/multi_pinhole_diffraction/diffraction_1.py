@@ -1,10 +1,10 @@
 import numpy as np
-from skimage.transform import resize
 
 import sys
 sys.path.insert(0, '../../tools')
 from rendering import *
 from geometry import *
+from interference import *
 
 
 name = 'diffraction_1'
@@ -36,9 +36,8 @@ def make_frame(t):
     s = 0.15
     pi_ = np.pi * (1 + progress) * (2/pinholes)
 
-    coords = np.mgrid[-width:width, -height:height].transpose([1,2,0]) * s
-    I = np.abs(np.sum([ np.exp(np.sum(1j*coords * (np.cos(j * pi_), np.sin(j * pi_)), axis=2))
-                           for j in range(pinholes)], axis = 0))
+    k = wave_vectors(np.arange(pinholes) * pi_)
+    I = np.abs(plane_waves(k, grid_axis(width, s), grid_axis(height, s)))
 
     I -= np.min(I)
     I /= np.max(I)
@@ -46,7 +45,7 @@ def make_frame(t):
     I = np.minimum(1, I*2)
     I *= 255.0
 
-    I = resize(I, (width, height))
+    I = downsample(I, 2)
 
     # border
     I *= mask
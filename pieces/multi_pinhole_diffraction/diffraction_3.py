@@ -1,10 +1,10 @@
 import numpy as np
-from skimage.transform import resize
 
 import sys
 sys.path.insert(0, '../../tools')
 from rendering import *
 from geometry import *
+from interference import *
 
 
 name = 'diffraction_3'
@@ -43,11 +43,8 @@ def make_frame(t):
         angles.append(angles[i] + (72*progress if i%2==0 else 72*(1-progress)) * (np.pi/180))
     angles = angles[1:]
 
-    coords = np.mgrid[-width:width, -height:height].transpose([1,2,0]) * s
-    I = np.sum([
-            np.square(
-                np.sin(pi_ * np.sum(coords * (-np.sin(angles[i]), np.cos(angles[i])), axis=2)))
-                    for i in range(exposures)], axis=0)
+    k = pi_ * np.stack([-np.sin(angles), np.cos(angles)], axis=-1)
+    I = sine_squares(k, grid_axis(width, s), grid_axis(height, s))
 
     I -= np.min(I)
     I /= np.max(I)
@@ -55,7 +52,7 @@ def make_frame(t):
     I = np.maximum(0, np.minimum(1,  I * 2 - 0.25))
     I *= 255
 
-    I = resize(I, (width, height))
+    I = downsample(I, 2)
 
     # border
     I *= mask
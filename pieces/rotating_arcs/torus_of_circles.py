@@ -11,6 +11,9 @@ name = 'torus_of_circles'
 width, height = 768, 768
 duration = 4
 
+# Second half plays the first one backwards, mirrored at the horizontal axis
+symmetry = {'reverse': True, 'transform': 'flipud'}
+
 
 # Render frame at time t
 def make_frame(t):
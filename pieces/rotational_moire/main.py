@@ -12,6 +12,10 @@ duration = 6
 
 rows, cols, dist, radius = 25, 25, 27, 3
 
+# hermite(1 - s) == 1 - hermite(s), so the angles at duration - t are multiples of pi/2 minus those at t. The
+# grid is centered and 4-fold symmetric, so the second half of the loop is the first half mirrored
+symmetry = {'reverse': True, 'transform': 'fliplr'}
+
 
 webm_params = {
     '-b:v': '3000k',
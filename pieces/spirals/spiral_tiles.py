@@ -4,6 +4,7 @@ import sys
 sys.path.insert(0, '../../tools')
 from rendering import *
 from geometry import *
+from spline import *
 
 
 name = 'spiral_tiles'
@@ -33,7 +34,7 @@ def make_frame(t):
             p.append((polar_to_cartesian(r, theta)))
         p = np.array(p)
         p = 0.95 * p + 0.05 * p.mean(axis=0)
-        p = [de_boor(t, p, 3) for t in np.linspace(0, len(p), 10*len(p))]
+        p = bspline(np.linspace(0, len(p), 10*len(p)), p, 3)
         gz.polyline(points=p, stroke_width=0, fill=(1,1,1,1), close_path=True).translate([width/2, height/2]).draw(surface)
 
     return surface.get_npimage()
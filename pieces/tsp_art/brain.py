@@ -6,6 +6,8 @@ sys.path.insert(0, '../../tools')
 from rendering import *
 from stippling import *
 from tsp import *
+from artifacts import *
+from tasks import *
 
 
 name = 'brain_tsp'
@@ -13,11 +15,13 @@ width, height = 768, 768
 duration = 1
 
 
+@task(inputs=['brain_shape.png'], outputs=['brain_shape.npy'])
 def stipple_image():
     points = stipple_image_points('brain_shape.png', n_points=1000, scale_factor=2, max_iterations=100)
     np.save('brain_shape.npy', points)
 
 
+@task(inputs=['brain_shape.npy'], outputs=['brain_processed.npy'])
 def solve_tsp():
     points = np.load('brain_shape.npy')
     write_tsp('brain.tsp', points)
@@ -34,16 +38,15 @@ def make_frame(t):
     radius = 3
 
     progress = t / duration
-    weights = equidistant_weight_functions(progress, n_segments+1, 'none')
-
-    points = np.load('brain_processed.npy')[::2,:] + np.array([0, 15])
+    points = load_artifact('brain_processed.npy')[::2,:] + np.array([0, 15])
 
     n_extra_segments = len(points) % n_segments
     if n_extra_segments > 0:
         points = points[:-n_extra_segments,:]
 
-    for i in range(0, len(points), n_segments):
-        point = sum([weights[j] * points[(i+j) % len(points), :] for j in range(len(weights))])
+    # Every circle moves along the path to the start of the next segment
+    tracks = np.array([np.roll(points, -j, axis=0)[::n_segments] for j in range(n_segments+1)])
+    for point in blend_keyframes(progress, tracks, 'none'):
         gz.circle(r=radius, xy=point, fill=(.4,.4,.4), stroke=(1,1,1), stroke_width=1).draw(surface)
 
     return surface.get_npimage()
@@ -51,8 +54,7 @@ def make_frame(t):
 
 # Render animation
 if __name__ == '__main__':
-    # stipple_image()
-    # solve_tsp()
+    run_tasks()
 
     save_poster(name, make_frame)
     render_webm(name, make_frame, duration, webm_params)
@@ -6,6 +6,9 @@ sys.path.insert(0, '../../tools')
 from rendering import *
 from stippling import *
 from tsp import *
+from batch_draw import *
+from artifacts import *
+from tasks import *
 
 
 name = 'celtic_knot_tsp'
@@ -13,11 +16,13 @@ width, height = 768, 768
 duration = 60
 
 
+@task(inputs=['celtic_knot_shape.png'], outputs=['celtic_knot_shape.npy'])
 def stipple_image():
     points = stipple_image_points('celtic_knot_shape.png', n_points=6000, scale_factor=2, max_iterations=100)
     np.save('celtic_knot_shape.npy', points)
 
 
+@task(inputs=['celtic_knot_shape.npy'], outputs=['celtic_knot_processed.npy'])
 def solve_tsp():
     points = np.load('celtic_knot_shape.npy')
     write_tsp('celtic_knot.tsp', points)
@@ -34,24 +39,23 @@ def make_frame(t):
     progress = t / duration
     p = interval_progresses(progress, 2, 'none')
 
-    points = np.load('celtic_knot_processed.npy')
+    points = load_artifact('celtic_knot_processed.npy')
 
     head = int(round(len(points) * progress))
     tail_length = len(points)/6
 
-    for i in range(len(points)):
-        i_ = i if (i < head) else (i - len(points))
-        segment_color =  color * (1 - .5 * min(1, (head - i_) / tail_length))
-        gz.polyline(points=(points[i,:], points[(i+1) % len(points),:]),
-                    stroke=segment_color, stroke_width=3, line_cap='round').draw(surface)
+    i = np.arange(len(points))
+    i_ = np.where(i < head, i, i - len(points))
+    segment_colors = color * (1 - .5 * np.minimum(1, (head - i_) / tail_length))[:,None]
+    draw_segments(surface, points, np.roll(points, -1, axis=0),
+                  stroke=segment_colors, stroke_width=3, line_cap='round')
 
     return surface.get_npimage()
 
 
 # Render animation
 if __name__ == '__main__':
-    # stipple_image()
-    solve_tsp()
+    run_tasks()
 
     save_poster(name, make_frame)
     render_webm(name, make_frame, duration, webm_params)
@@ -6,6 +6,9 @@ sys.path.insert(0, '../../tools')
 from rendering import *
 from tsp import *
 from project_3d import *
+from lines_3d import *
+from artifacts import *
+from tasks import *
 from icosphere import *
 
 
@@ -15,6 +18,7 @@ duration = 300
 
 
 
+@task(outputs=['globe.npy'])
 def genererate_points():
     # points = np.random.randn(2000, 3)
     # points /= np.sqrt(np.sum(np.square(points), axis=1, keepdims=True))
@@ -22,6 +26,7 @@ def genererate_points():
     np.save('globe.npy', points)
 
 
+@task(inputs=['globe.npy'], outputs=['globe_processed.npy'])
 def solve_tsp():
     points = np.load('globe.npy')
     write_tsp_dist('globe.tsp', distance_matrix(points, points) * 10000)
@@ -37,7 +42,7 @@ def make_frame(t):
 
     # get points
     r = 0.6
-    points = np.load('globe_processed.npy')[::2] * r
+    points = load_artifact('globe_processed.npy')[::2] * r
     points = np.roll(points, shift=-int(progress * len(points)) - 8, axis=0)
     points = np.concatenate([points]*5, axis=0)
     points *= np.linspace(0, 1, len(points))[:,None]
@@ -53,24 +58,13 @@ def make_frame(t):
     points, z = project(C, points, (width, height))
 
     # switch from points to lines and sort by depth
-    lines = np.array([(points[i], points[i+1]) for i in range(len(points) - 1)])
-    z_lines = np.array([ (z[i] + z[i+1]) / 2 for i in range(len(z) - 1)])
-    sort_indices = np.argsort(z_lines)
-    lines = lines[sort_indices]
-    z_lines = z_lines[sort_indices]
+    lines, z_lines, sort_indices = depth_sorted_segments(points, z, closed=False)
     thickness = thickness[sort_indices]
 
-    # relative depth for shading
-    z_min, z_max = z_lines.min(), z_lines.max()
-    z_middle = (z_min + z_max)/2
-    z_ratios = (r + z_lines - z_middle) / (2*r)
-
-    # draw lines
-    for i in range(len(lines)):
-        gz.polyline(points=lines[i],
-                    stroke_width=(3 + 3 * z_ratios[i]) * thickness[i],
-                    stroke=[0.2 + 0.8 * z_ratios[i] * thickness[i]]*3,
-                    line_cap='round').draw(surface)
+    # draw lines with relative depth for shading
+    draw_depth_sorted(surface, lines, depth_ratios(z_lines, radius=r),
+                      stroke_width=lambda z: (3 + 3 * z) * thickness,
+                      stroke=lambda z: 0.2 + 0.8 * z * thickness)
     gz.circle(xy=points[-1], r=6, stroke=None, fill=(1,1,1)).draw(surface)
 
     return surface.get_npimage()
@@ -78,8 +72,7 @@ def make_frame(t):
 
 # Render animation
 if __name__ == '__main__':
-    # genererate_points()
-    # solve_tsp()
+    run_tasks()
 
     # save_poster(name, make_frame)
     # render_webm(name, make_frame, duration, webm_params)
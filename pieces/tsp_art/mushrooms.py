@@ -6,6 +6,8 @@ sys.path.insert(0, '../../tools')
 from rendering import *
 from stippling import *
 from tsp import *
+from artifacts import *
+from tasks import *
 
 
 name = 'mushrooms_tsp'
@@ -13,11 +15,13 @@ width, height = 768, 768
 duration = 3
 
 
+@task(inputs=['mushrooms_shape.png'], outputs=['mushrooms_shape.npy'])
 def stipple_image():
     points = stipple_image_points('mushrooms_shape.png', n_points=3500, scale_factor=2, max_iterations=100)
     np.save('mushrooms_shape.npy', points)
 
 
+@task(inputs=['mushrooms_shape.npy'], outputs=['mushrooms_processed.npy'])
 def solve_tsp():
     points = np.load('mushrooms_shape.npy')
     write_tsp('mushrooms.tsp', points)
@@ -34,7 +38,7 @@ def make_frame(t):
     progress = t / duration
     p = interval_progresses(progress, 2, 'none')
 
-    points = np.load('mushrooms_processed.npy')[:,:] + np.array([30, 0])
+    points = load_artifact('mushrooms_processed.npy')[:,:] + np.array([30, 0])
 
     n_waves = 30
     for i in range(len(points)):
@@ -47,8 +51,7 @@ def make_frame(t):
 
 # Render animation
 if __name__ == '__main__':
-    # stipple_image()
-    # solve_tsp()
+    run_tasks()
 
     save_poster(name, make_frame)
     render_webm(name, make_frame, duration, webm_params)
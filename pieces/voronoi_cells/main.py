@@ -6,6 +6,9 @@ sys.path.insert(0, '../../tools')
 from rendering import *
 from stippling import *
 from tsp import *
+from spline import *
+from artifacts import *
+from tasks import *
 
 
 name = 'voronoi_cells_tsp_eye'
@@ -38,6 +41,7 @@ bottom = geo.point.Point(0.5 * width, 0.76 * height).buffer(10)
 
 
 # Prepare input for Voronoi stippling
+@task(outputs=['eye_shape.png'])
 def prepare_eye_shape():
     surface = gz.Surface(width=width, height=height)
     gz.rectangle(lx=width, ly=height, xy=(width/2, height/2), fill=(0,0,0)).draw(surface)
@@ -57,12 +61,14 @@ def prepare_eye_shape():
 
 
 # Stipple image and create TSP problem
+@task(inputs=['eye_shape.png'], outputs=['eye_stippled.npy'])
 def stipple_image():
     points = stipple_image_points('eye_shape.png', n_points=1000, scale_factor=2, max_iterations=250)
     np.save('eye_stippled.npy', points)
 
 
 # Solve TSP problem
+@task(inputs=['eye_stippled.npy'], outputs=['eye_processed.npy'])
 def solve_tsp():
     points = np.load('eye_stippled.npy')
     route = solve_tsp_ortools(points)
@@ -71,6 +77,7 @@ def solve_tsp():
 
 
 # Prepare keyframes
+@task(inputs=['eye_processed.npy'], outputs=['eye_keyframes.npy'])
 def prepare_keyframes(n_keyframes=30, n_vertices=24):
     base_points = np.load('eye_processed.npy')[::1]
     center_and_scale(base_points, (height/2, width/2), width/2 * (110./128.))
@@ -125,35 +132,27 @@ def make_frame(t):
     color = np.array([1.,1.,1.])
     surface = gz.Surface(width, height)
 
-    keyframes = np.load('eye_keyframes.npy')
+    keyframes = load_artifact('eye_keyframes.npy')
     progress = t / duration
-    weights = equidistant_weight_functions(progress, len(keyframes))
+    cells = blend_keyframes(progress, keyframes)
 
     n_points = keyframes.shape[1]
     n_vertices = keyframes.shape[2] - 2
+    theta = (2 * np.pi * np.arange(n_vertices)) / float(n_vertices)
+    r_dirs = np.stack([np.sin(theta), np.cos(theta)], axis=1)
     for i in range(n_points):
-        center = sum([weights[j] * keyframes[j,i,:2] for j in range(len(keyframes))])
-
-        vertices = []
-        for v in range(n_vertices):
-            theta = (2 * np.pi * v) / float(n_vertices)
-            r_dir = np.array([np.sin(theta), np.cos(theta)])
-            dist = sum([weights[j] * keyframes[j,i,v+2] for j in range(len(keyframes))])
-            vertices.append(center + dist * r_dir)
+        center = cells[i,:2]
+        vertices = center + cells[i,2:,None] * r_dirs
 
         vertices_geo = geo.polygon.Polygon(vertices)
         inside = vertices_geo.intersection(iris).area / vertices_geo.area
 
-        vertices_bz = []
         vertices_np = np.array(vertices)
         degree = 5
-        for r in range(len(vertices)):
-            n_subdivs = int(np.linalg.norm(vertices_np[r,:] - vertices_np[(r+1) % len(vertices),:]))
-            n_subdivs = max(1, n_subdivs)
-            for s in range(n_subdivs):
-                t = r + float(s) / n_subdivs
-                bz = de_boor(t, vertices_np, degree)
-                vertices_bz.append((bz[0], bz[1]))
+        n_subdivs = np.linalg.norm(vertices_np - np.roll(vertices_np, -1, axis=0), axis=1).astype(int)
+        n_subdivs = np.maximum(1, n_subdivs)
+        t = np.concatenate([r + np.arange(n) / n for r, n in enumerate(n_subdivs)])
+        vertices_bz = bspline(t, vertices_np, degree)
 
         color_factor = (1-progress) * float(i**10 % n_points) / n_points + \
             progress * float((i+1)**10 % n_points) / n_points
@@ -165,10 +164,7 @@ def make_frame(t):
 
 # Render animation
 if __name__ == '__main__':
-    prepare_eye_shape()
-    stipple_image()
-    solve_tsp()
-    prepare_keyframes()
+    run_tasks()
 
     save_poster(name, make_frame)
     render_webm(name, make_frame, duration, webm_params)
@@ -6,6 +6,9 @@ sys.path.insert(0, '../../tools')
 from rendering import *
 from geometry import *
 from stippling import *
+from batch_draw import *
+from spline import *
+from artifacts import *
 
 
 
@@ -56,23 +59,25 @@ def prepare_data():
         np.save(f'animals/{names[n+1]}_perm.npy', B[perm])
 
 
-# Render frame at time t
-def make_frame(t):
-    surface = gz.Surface(width, height)
+image_paths = [f'animals/{name}.npy' for name in
+                ['grid', 'lion_perm', 'tiger_perm', 'grizzly_perm',
+                 'wolf_perm', 'shark_perm', 'snake_perm', 'spider_perm',
+                 'owl_perm', 'eagle_perm', 'grid_perm']]
 
-    image_paths = [f'animals/{name}.npy' for name in
-                    ['grid', 'lion_perm', 'tiger_perm', 'grizzly_perm',
-                     'wolf_perm', 'shark_perm', 'snake_perm', 'spider_perm',
-                     'owl_perm', 'eagle_perm', 'grid_perm']]
-    coords = np.array([np.load(path) for path in image_paths]) * width / 3000
 
-    progress = t / duration
-    coords = np.repeat(coords, [3,] + [2] * (len(coords)-2) + [3,], axis=0)
+def get_keyframes(*coords):
+    coords = np.array(coords) * width / 3000
+    return np.repeat(coords, [3,] + [2] * (len(coords)-2) + [3,], axis=0)
 
-    for i in range(len(coords[0])):
-        point = de_boor(progress * (len(coords) - 3.4) + 3, coords[:,i,:], degree=3)
-        gz.circle(xy=point, r=1.5, fill=(1,1,1)).draw(surface)
 
+# Render frame at time t
+def make_frame(t):
+    coords = derived_artifact(get_keyframes, *image_paths)
+    progress = t / duration
+
+    points = bspline(progress * (len(coords) - 3.4) + 3, coords, degree=3)
+    surface = gz.Surface(width, height)
+    draw_circles(surface, points, 1.5, fill=(1,1,1))
     return surface.get_npimage()
 
 
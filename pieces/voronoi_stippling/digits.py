@@ -4,6 +4,7 @@ import sys
 sys.path.insert(0, '../../tools')
 from rendering import *
 from stippling import *
+from artifacts import *
 
 
 name = 'digits'
@@ -25,16 +26,12 @@ def make_frame(t):
 
     image_paths = [f'digits/{9-j}.npy' for j in range(10)]
     image_paths.append(image_paths[0])
-    coords = [np.load(path) * (height/1500) for path in image_paths]
+    coords = [load_artifact(path) * (height/1500) for path in image_paths]
 
     progress = t / duration
-    weights = equidistant_weight_functions(progress, len(coords), 'hermite')
+    points = blend_keyframes(progress, coords, 'hermite')
     max_dist = 36
 
-    points = np.zeros(coords[0].shape)
-    for i in range(len(coords[0])):
-        points[i,:] = sum([weights[j] * coords[j][i,:] for j in range(len(coords))])
-
     for i in range(len(points)):
         for j in range(i+1, len(points)):
             p1, p2 = points[i,:], points[j,:]
@@ -5,6 +5,7 @@ sys.path.insert(0, '../../tools')
 from rendering import *
 from geometry import *
 from stippling import *
+from artifacts import *
 
 
 name = 'hypnotoad'
@@ -21,7 +22,7 @@ def prepare_data():
 def make_frame(t):
     surface = gz.Surface(width, height)
     progress = t / duration
-    points = np.load('hypnotoad.npy') * height/3000
+    points = load_artifact('hypnotoad.npy') * height/3000
 
     n_circles = 5
     for j in range(n_circles + 1):
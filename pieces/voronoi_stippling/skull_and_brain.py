@@ -6,6 +6,7 @@ sys.path.insert(0, '../../tools')
 from rendering import *
 from geometry import *
 from stippling import *
+from batch_draw import *
 
 
 
@@ -47,18 +48,15 @@ def prepare_data():
 
 # Render frame at time t
 def make_frame(t):
-    surface = gz.Surface(width, height)
-
     skull = np.load('skull_and_brain/skull.npy') * width / 3000
     brain = np.load('skull_and_brain/brain.npy') * width / 3000
 
     progress = t / duration
     p = interval_progresses(progress, 2, 'hermite')
 
-    for i in range(len(skull)):
-        point = (1 - p[0] + p[1]) * skull[i] + (p[0] - p[1]) * brain[i]
-        gz.circle(xy=point, r=1.5, fill=(1,1,1)).draw(surface)
-
+    points = (1 - p[0] + p[1]) * skull + (p[0] - p[1]) * brain
+    surface = gz.Surface(width, height)
+    draw_circles(surface, points, 1.5, fill=(1,1,1))
     return surface.get_npimage()
 
 
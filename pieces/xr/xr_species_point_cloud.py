@@ -7,6 +7,9 @@ sys.path.insert(0, '../../tools')
 from rendering import *
 from geometry import *
 from stippling import *
+from stipple_batch import stipple_images, points_name
+from batch_draw import *
+from spline import *
 
 
 
@@ -32,7 +35,7 @@ duration = 1200
 np.random.seed(123)
 species_pngs = sorted(glob.glob('species/critically endangered/*.png'))
 species_pngs = list(np.random.permutation(species_pngs))
-species_names = [png.split('\\')[-1].split('.')[0] for png in species_pngs]
+species_names = [points_name(png) for png in species_pngs]
 print(len(species_names))
 
 # species_names = ['Rhampholeon acuminatus']
@@ -63,12 +66,8 @@ def prepare_data():
     # points = stipple_image_points(f'extinction_symbol.png', n_points=n_points, scale_factor=1, max_iterations=100) * 1.5
     # np.save(f'species/np/_xr', points)
 
-    # Stipple all the species images
-    for png, name in zip(species_pngs, species_names):
-        if not os.path.isfile(f'species/np/{name}.npy'):
-            print(f'Stipple file {png} for species {name}:')
-            points = stipple_image_points(png, n_points=n_points, scale_factor=1, max_iterations=100)
-            np.save(f'species/np/{name}', points)
+    # Stipple all the species images (in parallel, skipping those that are done already)
+    stipple_images(species_pngs, 'species/np', n_points=n_points, scale_factor=1, max_iterations=100)
 
     # Find optimal transport between consecutive point clouds
     names = ['_xr', *species_names, '_xr']
@@ -117,7 +116,7 @@ def render_species(forced_names=[], thumbnail_size=(300,300), update_zip=False):
     import datetime
 
     stippled = sorted(glob.glob('species/np/*.npy'))
-    species_names = [name.split('\\')[-1].split('.')[0] for name in stippled if not '_' in name]
+    species_names = [points_name(path) for path in stippled if not '_' in points_name(path)]
     if forced_names == 'all':
         forced_names = list(species_names)
 
@@ -188,9 +187,8 @@ def make_frame(t):
                     h_align='center', v_align='top').draw(surface)
 
     # Interpolated stipple points
-    for i in range(len(coords[0])):
-        point = de_boor(progress * (len(coords) - 3) + 3, coords[:,i,:], degree=3)
-        gz.circle(xy=point, r=1.5, fill=(1,1,1)).draw(surface)
+    points = bspline(progress * (len(coords) - 3) + 3, coords, degree=3)
+    draw_circles(surface, points, 1.5, fill=(1,1,1))
 
     # gz.text(labels[1],
     #         fontfamily='FUCXED CAPS', fontsize=48,
@@ -0,0 +1,6 @@
+import os, sys
+
+# The tools are flat modules imported from pieces with sys.path.insert(0, '../../tools'), do the same here
+tools_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools')
+pieces_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pieces')
+sys.path.insert(0, tools_dir)
@@ -0,0 +1,35 @@
+import multiprocessing
+import numpy as np
+import pytest
+
+pytest.importorskip('gizeh')
+import profiling
+import rendering
+from spline import bspline
+from interference import plane_waves, wave_vectors, grid_axis
+
+
+def make_frame(t):
+    # Looked up in this module's globals, where instrument() replaces the entry points
+    point = bspline(t, np.array([[0, 0], [1, 0], [1, 1], [0, 1]], dtype=float))
+    I = np.abs(plane_waves(wave_vectors([0, t], 0.1), grid_axis(16), grid_axis(16)))
+    return np.repeat((I * 100 + point[0]).astype(np.uint8)[:,:,None], 3, axis=2)
+
+
+def stage_names():
+    times, counts, rows = profiling.take_stats()
+    return {path.split(';')[-1] for path in times}, len(rows)
+
+
+@pytest.mark.parametrize('start_method', ['fork', 'spawn'])
+def test_worker_stages(monkeypatch, start_method):
+    if start_method not in multiprocessing.get_all_start_methods():
+        pytest.skip(f'{start_method} is not available')
+    monkeypatch.setattr(rendering, 'Pool', multiprocessing.get_context(start_method).Pool)
+    profiling.take_stats()
+
+    frames = list(rendering.render_indices(profiling.profiled_make_frame(make_frame, True), list(range(8)), 10,
+                                           processes=2, chunk_size=2))
+    names, n_rows = stage_names()
+    assert len(frames) == n_rows == 8
+    assert {'frame', 'bspline', 'interference'} <= names
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('matplotlib')
+from stippling import has_converged, resample_points
+
+
+def history(energies):
+    return {'max_shift': [1.0] * len(energies), 'mean_shift': [1.0] * len(energies), 'energy': energies}
+
+
+def test_energy_convergence():
+    assert has_converged(history([100.0, 99.95]), energy_tolerance=1e-3)
+    assert not has_converged(history([100.0, 99.0]), energy_tolerance=1e-3)
+    assert not has_converged(history([100.0]), energy_tolerance=1e-3)
+
+
+def test_rising_energy_has_not_converged():
+    assert not has_converged(history([100.0, 100.5]), energy_tolerance=1e-3)
+    assert not has_converged(history([100.0, 130.0]), energy_tolerance=1e-3)
+
+
+def test_resample_single_point():
+    np.random.seed(0)
+    points = resample_points(np.array([[10.0, 20.0]]), 4)
+    assert points.shape == (4, 2)
+    assert np.all(np.isfinite(points))
+    assert np.allclose(np.hypot(*(points - (10, 20)).T), 1)
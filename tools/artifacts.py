@@ -0,0 +1,96 @@
+import os, sys, time
+import argparse
+from collections import Counter
+import numpy as np
+
+
+# Precomputed data (stipple points, TSP tours, keyframes) is loaded once per process instead of once per frame.
+# Arrays are memory mapped read-only, so all render worker processes share the same pages. Entries are keyed by
+# path and modification time, so re-running a preparation step is picked up without restarting.
+#
+# Set ARTIFACT_STATS=1 to count how often each file is requested and actually read in this process, or run
+#   python artifacts.py <piece.py> [--frames 3]
+# to find pieces that still call np.load inside make_frame.
+
+_artifacts = {}
+_derived = {}
+artifact_requests = Counter()
+artifact_reads = Counter()
+
+
+def _key(path):
+    path = os.path.abspath(path)
+    return path, os.path.getmtime(path)
+
+
+def load_artifact(path, mmap=True):
+    # Returns a read-only array; derive new arrays from it (e.g. points * scale) instead of changing it in place
+    key = _key(path)
+    artifact_requests[key[0]] += 1
+    if key not in _artifacts:
+        for old_key in [k for k in _artifacts if k[0] == key[0]]:
+            del _artifacts[old_key]
+        _artifacts[key] = np.load(path, mmap_mode='r' if mmap else None)
+        artifact_reads[key[0]] += 1
+    return _artifacts[key]
+
+
+def derived_artifact(compute, *paths):
+    # Memoized compute(*arrays) for the loaded paths, e.g. keyframes stacked and scaled from several files.
+    # compute must only depend on the arrays and on constants of the piece
+    key = (compute.__module__, compute.__qualname__) + tuple(_key(path) for path in paths)
+    if key not in _derived:
+        for old_key in [k for k in _derived if k[:2] == key[:2]]:
+            del _derived[old_key]
+        _derived[key] = compute(*[load_artifact(path) for path in paths])
+    return _derived[key]
+
+
+def report(n_frames=None, file=sys.stdout):
+    for path in sorted(artifact_requests):
+        per_frame = f', {artifact_requests[path] / n_frames:.1f} per frame' if n_frames else ''
+        print(f'{artifact_requests[path]:7} requests, {artifact_reads[path]:3} reads{per_frame}   {path}', file=file)
+
+
+if os.environ.get('ARTIFACT_STATS'):
+    import atexit
+    atexit.register(report)
+
+
+def count_loads(piece_path, n_frames=3):
+    # Import a piece without running its __main__ block, render a few frames and count the raw np.load calls
+    # and artifact requests per frame
+    raw_loads = Counter()
+    np_load = np.load
+    def counting_load(file, *args, **kwargs):
+        raw_loads[os.path.abspath(file) if isinstance(file, str) else repr(file)] += 1
+        return np_load(file, *args, **kwargs)
+
+    # Imported here, pieces import this module and benchmark is only needed to run the command line check
+    from benchmark import import_piece
+    module = import_piece(piece_path)
+
+    # Only count loads during make_frame, not while importing
+    np.load = counting_load
+    artifact_requests.clear()
+    try:
+        start = time.perf_counter()
+        for t in np.linspace(0, module.duration, n_frames, endpoint=False):
+            module.make_frame(t)
+        seconds = time.perf_counter() - start
+    finally:
+        np.load = np_load
+
+    print(f'{n_frames} frames in {seconds:.2f}s')
+    for path, count in sorted(raw_loads.items()):
+        print(f'{count / n_frames:7.1f} np.load calls per frame   {path}')
+    report(n_frames)
+    return raw_loads
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Count the data files a piece loads per frame')
+    parser.add_argument('piece', help='path to the piece, e.g. pieces/tsp_art/globe.py')
+    parser.add_argument('--frames', type=int, default=3)
+    args = parser.parse_args()
+    count_loads(args.piece, args.frames)
@@ -0,0 +1,153 @@
+import os, sys, glob, json, time
+import argparse
+import importlib.util
+import traceback
+import multiprocessing
+import numpy as np
+
+
+# Times make_frame of every piece without rendering a video. Each piece is imported in a fresh process (its
+# __main__ block does not run), then a few frames spread over the loop are rendered. The first frame is reported
+# separately as the cold frame, since it includes lazy loading and caches filled on first use.
+#
+# Every run is appended to a JSON history, and pieces whose warm median got slower than in their previous run
+# by more than the threshold are flagged:
+#   python benchmark.py [pattern] [--frames 6] [--threshold 0.2]
+
+tools_dir = os.path.dirname(os.path.abspath(__file__))
+pieces_dir = os.path.join(tools_dir, '..', 'pieces')
+history_path = os.path.join(tools_dir, '..', '.benchmarks.json')
+
+
+def import_piece(piece_path):
+    # Import a piece like running it from its own directory, but without its __main__ block
+    piece_path = os.path.abspath(piece_path)
+    os.chdir(os.path.dirname(piece_path))
+    if tools_dir not in sys.path:
+        sys.path.insert(0, tools_dir)
+    spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(piece_path))[0], piece_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def peak_rss():
+    # Peak resident set size of this process in MB (ru_maxrss is in kB on Linux, bytes on macOS), None where the
+    # resource module does not exist (Windows)
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1e6 if sys.platform == 'darwin' else rss / 1e3
+
+
+def benchmark_piece(piece_path, n_frames=6):
+    start = time.perf_counter()
+    try:
+        module = import_piece(piece_path)
+        import_seconds = time.perf_counter() - start
+        make_frame, duration = module.make_frame, module.duration
+        fps = int(getattr(module, 'webm_params', {}).get('-framerate', 50))
+
+        times = []
+        for t in np.linspace(0, duration, n_frames, endpoint=False):
+            start = time.perf_counter()
+            frame = make_frame(t)
+            times.append(time.perf_counter() - start)
+    except Exception as e:
+        return {'error': ''.join(traceback.format_exception_only(type(e), e)).strip()}
+
+    warm = np.array(times[1:] or times)
+    rss = peak_rss()
+    return {
+        'size': list(np.shape(frame)[:2][::-1]),
+        'import': round(import_seconds, 4),
+        'cold': round(times[0], 4),
+        'p50': round(float(np.percentile(warm, 50)), 4),
+        'p90': round(float(np.percentile(warm, 90)), 4),
+        'max': round(float(warm.max()), 4),
+        'peak_rss_mb': None if rss is None else round(rss, 1),
+        'projected_render': round(float(warm.mean()) * int(np.ceil(duration * fps)), 1),
+    }
+
+
+def _benchmark_in_process(args):
+    return benchmark_piece(*args)
+
+
+def find_pieces(pattern='*/*.py'):
+    # Modules defining make_frame, which leaves out helpers and the interactive pygame sketches
+    pieces = []
+    for path in sorted(glob.glob(os.path.join(pieces_dir, pattern))):
+        with open(path, encoding='utf-8', errors='replace') as f:
+            if 'def make_frame(' in f.read():
+                pieces.append(path)
+    return pieces
+
+
+def load_history():
+    if os.path.isfile(history_path):
+        with open(history_path) as f:
+            return json.load(f)
+    return []
+
+
+def save_history(history):
+    tmp_path = f'{history_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(history, f, indent=1)
+    os.replace(tmp_path, history_path)
+
+
+def find_regressions(results, previous, threshold=0.2):
+    # Pieces whose warm median is more than threshold slower than in the previous run
+    regressions = {}
+    for piece, result in results.items():
+        before = previous.get(piece, {})
+        if 'p50' in result and 'p50' in before and result['p50'] > before['p50'] * (1 + threshold):
+            regressions[piece] = result['p50'] / before['p50']
+    return regressions
+
+
+def run_benchmarks(piece_paths, n_frames=6, threshold=0.2, save=True):
+    history = load_history()
+    # Latest successful result of every piece, also when earlier runs only covered some of them
+    previous = {}
+    for run in history:
+        previous.update((piece, result) for piece, result in run['pieces'].items() if 'error' not in result)
+
+    # A fresh process per piece, so imports, caches and peak memory do not carry over
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        for path in piece_paths:
+            piece = os.path.relpath(path, pieces_dir).replace(os.sep, '/')
+            result = pool.apply(_benchmark_in_process, ((path, n_frames),))
+            results[piece] = result
+            if 'error' in result:
+                print(f'{piece:60} failed: {result["error"].splitlines()[-1]}')
+            else:
+                print(f'{piece:60} cold {result["cold"]:7.3f}s   p50 {result["p50"]:7.3f}s   p90 {result["p90"]:7.3f}s   '
+                      f'{result["peak_rss_mb"] or float("nan"):7.0f} MB   full render ~{result["projected_render"]/60:6.1f} min')
+
+    regressions = find_regressions(results, previous, threshold)
+    for piece, ratio in sorted(regressions.items(), key=lambda item: -item[1]):
+        print(f'REGRESSION {piece}: warm median {ratio:.2f}x slower than the previous run')
+
+    if save:
+        history.append({'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'frames': n_frames, 'pieces': results})
+        save_history(history)
+    return results, regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark make_frame of all pieces')
+    parser.add_argument('pattern', nargs='?', default='*/*.py', help='glob pattern relative to pieces/, e.g. "lineart_3d/*.py"')
+    parser.add_argument('--frames', type=int, default=6, help='frames per piece, the first one is the cold frame')
+    parser.add_argument('--threshold', type=float, default=0.2, help='relative slowdown flagged as a regression')
+    parser.add_argument('--no-save', action='store_true', help='do not append this run to the history')
+    args = parser.parse_args()
+
+    results, regressions = run_benchmarks(find_pieces(args.pattern), args.frames, args.threshold, not args.no_save)
+    sys.exit(1 if regressions else 0)
@@ -1,3 +1,4 @@
+from functools import lru_cache
 import numpy as np
 from geometry import get_rotation_matrix
 # from scipy.optimize import fsolve
@@ -40,20 +41,67 @@ def u(m,x,p=0):
     #     return (np.sinh(k(m)) * np.sin(k(m) * x) + np.sin(k(m)) * np.sinh(k(m) * x)) / np.sqrt(np.sinh(k(m))**2 + np.sin(k(m))**2)
 
 
-def get_chladni_pattern(m, n, width, height, lim=1, angle=0, xphase=0, yphase=0):
-    if angle == 0:
-        xx, yy = np.mgrid[-lim:lim:2*lim/width, -lim:lim:2*lim/height]
+# Patterns are evaluated from 1D profiles instead of on full grids. The rotated coordinate c0 * x + c1 * y is
+# linear in the grid axes, so by the angle addition formulas of cos, sin, cosh and sinh each u(m, c0 * x + c1 * y)
+# is a sum of 4 outer products of vectors along x and y. Profiles are cached per mode number, phase and rotation.
+
+@lru_cache(maxsize=16)
+def chladni_axis(size, lim):
+    # Coordinates of the full grids np.mgrid[-lim:lim:2*lim/size] used before
+    axis = np.mgrid[-lim:lim:2*lim/size]
+    axis.flags.writeable = False
+    return axis
+
+
+@lru_cache(maxsize=256)
+def mode_profiles(m, p, width, height, lim, c0, c1):
+    # X (width, 4) and Y (height, 4) with u(m, c0 * x + c1 * y, p) == X @ Y.T
+    a = c0 * chladni_axis(width, lim)
+    b = c1 * chladni_axis(height, lim)
+    if m == 0:
+        X = np.sqrt(3/2) * np.stack([a, np.ones_like(a), 0*a, 0*a], axis=1)
+        Y = np.stack([np.ones_like(b), b, 0*b, 0*b], axis=1)
     else:
-        points = np.mgrid[-lim:lim:2*lim/width, -lim:lim:2*lim/height]
-        xx, yy = points.transpose(1,2,0).dot(get_rotation_matrix(angle)).transpose(2,0,1)
-    return u(m, xx, xphase) * u(n, yy, yphase) + u(n, xx, xphase) * u(m, yy, yphase)
+        km = k(m)
+        alpha = np.abs(m%2 - 1)
+        even = alpha / np.sqrt(np.cosh(km)**2 + np.cos(km + p)**2)
+        odd = (1 - alpha) / np.sqrt(np.sinh(km)**2 + np.sin(km + p)**2)
+        a, b = km * a, km * b
+        X = np.stack([
+            even * np.cosh(km) * np.cos(a + p) + odd * np.sinh(km) * np.sin(a + p),
+            odd * np.sinh(km) * np.cos(a + p) - even * np.cosh(km) * np.sin(a + p),
+            even * np.cos(km + p) * np.cosh(a) + odd * np.sin(km + p) * np.sinh(a),
+            even * np.cos(km + p) * np.sinh(a) + odd * np.sin(km + p) * np.cosh(a)], axis=1)
+        Y = np.stack([np.cos(b), np.sin(b), np.cosh(b), np.sinh(b)], axis=1)
+    X.flags.writeable = False
+    Y.flags.writeable = False
+    return X, Y
+
+
+def _product_profiles(f, g):
+    # Elementwise product of two sums of outer products: (a x b) * (c x d) == (a * c) x (b * d)
+    (X1, Y1), (X2, Y2) = f, g
+    return (X1[:,:,None] * X2[:,None,:]).reshape(len(X1), -1), (Y1[:,:,None] * Y2[:,None,:]).reshape(len(Y1), -1)
+
+
+def get_chladni_pattern(m, n, width, height, lim=1, angle=0, xphase=0, yphase=0, dtype=np.float32):
+    # u(m, xx) u(n, yy) + u(n, xx) u(m, yy) on the grid rotated by angle, composed in float64 as one matrix product
+    # of 32 outer products and returned as dtype
+    R = get_rotation_matrix(angle)
+    xx = lambda mode: mode_profiles(mode, xphase, width, height, lim, R[0,0], R[1,0])
+    yy = lambda mode: mode_profiles(mode, yphase, width, height, lim, R[0,1], R[1,1])
+    X1, Y1 = _product_profiles(xx(m), yy(n))
+    X2, Y2 = _product_profiles(xx(n), yy(m))
+    return (np.concatenate([X1, X2], axis=1) @ np.concatenate([Y1, Y2], axis=1).T).astype(dtype)
 
 
 # Equation used in https://demonstrations.wolfram.com/ChladniFigures/
-def get_wolfram_chladni_pattern(m, n, width, height, lim=5, xphase=0, yphase=0):
-    xx, yy = np.mgrid[-lim:lim:2*lim/width, -lim:lim:2*lim/height]
-    return np.cos(n * np.pi * xx + xphase)*np.cos(m * np.pi * yy + yphase) - np.cos(m * np.pi * xx + xphase)*np.cos(n * np.pi * yy + yphase)
-
+def get_wolfram_chladni_pattern(m, n, width, height, lim=5, xphase=0, yphase=0, dtype=np.float32):
+    x = chladni_axis(width, lim)
+    y = chladni_axis(height, lim)
+    I = np.outer(np.cos(n * np.pi * x + xphase), np.cos(m * np.pi * y + yphase))
+    I -= np.outer(np.cos(m * np.pi * x + xphase), np.cos(n * np.pi * y + yphase))
+    return I.astype(dtype)
 
 if __name__ == '__main__':
 
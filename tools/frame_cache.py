@@ -0,0 +1,203 @@
+import os, sys, glob, json, time
+import hashlib
+import argparse
+import numpy as np
+
+
+# Frames are stored as compressed .npz files, one directory per piece version:
+#   <cache_dir>/<key>/<frame time>.npz
+# The key hashes the piece source, the sources of all loaded tools modules and the frame size, so any
+# change to the code that draws the frames invalidates them, while changes to encoder parameters do not.
+#
+# Prepared data read through artifacts.load_artifact (stipple points, TSP tours, keyframes) is mostly loaded
+# lazily by the first frame, after the key is known. Its paths and modification times are recorded next to the
+# frames in data.json instead, and when one of these files changed (e.g. run_tasks reran a stipple step) the
+# frames of the entry are removed before any is reused. Files read with np.load directly are not tracked.
+
+tools_dir = os.path.dirname(os.path.abspath(__file__))
+cache_dir = os.environ.get('FRAME_CACHE_DIR', os.path.join(tools_dir, '..', '.frame_cache'))
+max_cache_size = int(float(os.environ.get('FRAME_CACHE_MAX_SIZE', 20e9)))
+
+
+def cache_enabled(cache=None):
+    if cache is None:
+        return bool(os.environ.get('FRAME_CACHE'))
+    return cache
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def get_piece_key(make_frame):
+    module = sys.modules[make_frame.__module__]
+    piece_path = os.path.abspath(module.__file__)
+
+    sha = hashlib.sha1()
+    sha.update(_read(piece_path))
+    tools_paths = sorted(set(os.path.abspath(m.__file__) for m in list(sys.modules.values())
+                             if getattr(m, '__file__', None) and os.path.dirname(os.path.abspath(m.__file__)) == tools_dir))
+    for path in tools_paths:
+        sha.update(_read(path))
+    width, height = make_frame.__globals__.get('width'), make_frame.__globals__.get('height')
+    sha.update(f'{width}x{height}'.encode())
+
+    name = os.path.splitext(os.path.basename(piece_path))[0]
+    return f'{name}_{sha.hexdigest()[:16]}', piece_path
+
+
+def loaded_data_files():
+    # Paths and modification times of the data files loaded through artifacts.py in this process
+    artifacts = sys.modules.get('artifacts')
+    if artifacts is None:
+        return {}
+    return {path: mtime for path, mtime in list(artifacts._artifacts)}
+
+
+class CachedMakeFrame():
+    # Picklable wrapper around make_frame, so it can be handed to the render worker processes
+
+    def __init__(self, make_frame, key=None, piece_path=None):
+        self.make_frame = make_frame
+        if key is None:
+            key, piece_path = get_piece_key(make_frame)
+        self.key = key
+        self.path = os.path.join(cache_dir, key)
+        self.data_checked = False
+        os.makedirs(self.path, exist_ok=True)
+        if piece_path is not None:
+            with open(os.path.join(self.path, 'piece.txt'), 'w') as f:
+                f.write(piece_path)
+
+    def frame_path(self, t):
+        return os.path.join(self.path, f'{t:014.6f}.npz')
+
+    def read_data_files(self):
+        try:
+            with open(os.path.join(self.path, 'data.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write_data_files(self, files):
+        path = os.path.join(self.path, 'data.json')
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(files, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def check_data_files(self):
+        # Once per process: remove the frames if a data file they were drawn from changed or is gone
+        self.data_checked = True
+        recorded = self.read_data_files()
+        current = {path: os.path.getmtime(path) for path in recorded if os.path.isfile(path)}
+        if current != recorded:
+            for path in glob.glob(os.path.join(self.path, '*.npz')):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self.write_data_files(current)
+
+    def record_data_files(self):
+        recorded = self.read_data_files()
+        loaded = loaded_data_files()
+        if any(recorded.get(path) != mtime for path, mtime in loaded.items()):
+            self.write_data_files(dict(recorded, **loaded))
+
+    def __call__(self, t):
+        if not self.data_checked:
+            self.check_data_files()
+        path = self.frame_path(t)
+        if os.path.isfile(path):
+            try:
+                with np.load(path) as data:
+                    frame = data['frame']
+                os.utime(path)
+                return frame
+            except (OSError, ValueError, KeyError):
+                pass
+
+        frame = self.make_frame(t)
+        self.record_data_files()
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, frame=np.asarray(frame))
+        os.replace(tmp_path, path)
+        return frame
+
+
+def cached_make_frame(make_frame, cache=None):
+    if not cache_enabled(cache) or isinstance(make_frame, CachedMakeFrame):
+        return make_frame
+    return CachedMakeFrame(make_frame)
+
+
+def list_frames():
+    return glob.glob(os.path.join(cache_dir, '*', '*.npz'))
+
+
+def evict(max_size=None):
+    # Remove least recently used frames until the cache fits into max_size bytes
+    max_size = max_cache_size if max_size is None else max_size
+    files = [(os.path.getmtime(path), os.path.getsize(path), path) for path in list_frames()]
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for _, size, path in sorted(files):
+        if total <= max_size:
+            break
+        os.remove(path)
+        total -= size
+        removed += 1
+    for path in glob.glob(os.path.join(cache_dir, '*')):
+        if os.path.isdir(path) and not glob.glob(os.path.join(path, '*.npz')):
+            purge(os.path.basename(path))
+    return removed, total
+
+
+def purge(key=None):
+    paths = glob.glob(os.path.join(cache_dir, key if key is not None else '*'))
+    for path in paths:
+        for file in glob.glob(os.path.join(path, '*')):
+            os.remove(file)
+        os.rmdir(path)
+    return len(paths)
+
+
+def info():
+    entries = []
+    for path in sorted(glob.glob(os.path.join(cache_dir, '*'))):
+        frames = glob.glob(os.path.join(path, '*.npz'))
+        piece_file = os.path.join(path, 'piece.txt')
+        piece = _read(piece_file).decode() if os.path.isfile(piece_file) else '?'
+        size = sum(os.path.getsize(f) for f in frames)
+        last_used = max([os.path.getmtime(f) for f in frames], default=0)
+        entries.append((os.path.basename(path), piece, len(frames), size, last_used))
+    return entries
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=f'Inspect or purge the frame cache in {os.path.abspath(cache_dir)}',
+                                     epilog='Entries are keyed by source code and frame size. Data files loaded through '
+                                            'artifacts.py are checked for changes before frames are reused, purge '
+                                            'entries of pieces that read changed data with np.load directly.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('info', help='list cached pieces with frame counts and sizes')
+    purge_parser = subparsers.add_parser('purge', help='remove cached frames')
+    purge_parser.add_argument('keys', nargs='*', help='cache keys to remove (default: everything)')
+    evict_parser = subparsers.add_parser('evict', help='remove least recently used frames')
+    evict_parser.add_argument('--max-size', type=float, default=max_cache_size, help='target cache size in bytes')
+    args = parser.parse_args()
+
+    if args.command == 'info':
+        entries = info()
+        for key, piece, n_frames, size, last_used in entries:
+            print(f'{key:40} {n_frames:7} frames {size/1e6:10.1f} MB   last used {time.strftime("%Y-%m-%d %H:%M", time.localtime(last_used))}   {piece}')
+        print(f'Total: {sum(e[2] for e in entries)} frames, {sum(e[3] for e in entries)/1e6:.1f} MB')
+    elif args.command == 'purge':
+        n = sum(purge(key) for key in args.keys) if args.keys else purge()
+        print(f'Removed {n} cache entries')
+    elif args.command == 'evict':
+        removed, total = evict(int(args.max_size))
+        print(f'Removed {removed} frames, cache is now {total/1e6:.1f} MB')
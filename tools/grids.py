@@ -0,0 +1,49 @@
+import time
+from functools import lru_cache
+import numpy as np
+
+from rendering import hermite
+
+
+# Frame-invariant arrays built once per process instead of in every make_frame: distances from the center and
+# circular masks. All returned arrays are shared between callers and read-only, use them in expressions
+# (I *= mask) or copy them before changing them. Coordinate grids of plane waves are not needed, see interference.
+
+
+def _read_only(array):
+    array.flags.writeable = False
+    return array
+
+
+@lru_cache(maxsize=16)
+def distance_field(width, height, center=None):
+    # float32 distances of the pixels (as in get_circle_mask, rows along x) to center, default the frame center
+    cx, cy = (width/2, height/2) if center is None else center
+    return _read_only(np.hypot(np.arange(width)[:,None] - cx, np.arange(height)[None,:] - cy).astype(np.float32))
+
+
+@lru_cache(maxsize=8)
+def circle_mask(width, height, r=0, fade=0):
+    # get_circle_mask from the cached distances with one clip: a one pixel wide edge, or a hermite falloff over
+    # fade pixels centered on r. Recently used radii are kept, so a constant radius costs nothing per frame
+    d = distance_field(width, height)
+    if fade <= 1:
+        mask = np.clip(r - d, 0, 1)
+    else:
+        mask = hermite(np.clip((r - d - 0.5) / np.abs(fade) + 0.5, 0, 1))
+    return _read_only(mask.astype(np.float32, copy=False))
+
+
+if __name__ == '__main__':
+    from geometry import get_circle_mask
+
+    width, height = 768, 768
+    for r, fade in [(300, 0), (317.3, 0), (300, 150)]:
+        start = time.perf_counter()
+        reference = get_circle_mask(width, height, r, fade)
+        seconds = time.perf_counter() - start
+        circle_mask(width, height, r + 1, fade)
+        start = time.perf_counter()
+        mask = circle_mask(width, height, r, fade)
+        print(f'r={r}, fade={fade}: get_circle_mask {seconds:.4f}s, circle_mask {time.perf_counter() - start:.4f}s, '
+              f'maximum difference {np.abs(mask - reference).max():.1e}')
@@ -0,0 +1,82 @@
+import time
+import numpy as np
+
+
+# Superpositions of plane waves and sinusoids on a pixel grid, without building the grid. A plane wave
+# exp(i (kx x + ky y)) is the outer product of exp(i kx x) along the rows and exp(i ky y) along the columns, so a
+# sum of n of them is one (len(x), n) @ (n, len(y)) matrix product of per-axis phasors. Phases are computed in
+# float64 on the axes only, the product is done in complex64 (float32 for sinusoids) by the threaded BLAS.
+#
+# Grids follow np.mgrid: x varies along the first axis of the result and y along the second, so
+#   plane_waves(k, grid_axis(width, s), grid_axis(height, s))
+# matches np.exp(1j * np.mgrid[-width:width, -height:height].transpose([1,2,0]) * s @ k.T).sum(axis=2).
+
+
+def grid_axis(n, spacing=1.0):
+    # Coordinates of np.mgrid[-n:n] * spacing
+    return np.arange(-n, n) * spacing
+
+
+def wave_vectors(angles, k=1.0):
+    # (n, 2) wave vectors of length k pointing in the given directions
+    angles = np.asarray(angles, dtype=np.float64)
+    return k * np.stack([np.cos(angles), np.sin(angles)], axis=-1)
+
+
+def plane_waves(k, x, y, amplitudes=None, dtype=np.complex64):
+    # Complex field sum_j amplitudes[j] * exp(i (k[j,0] x + k[j,1] y)) of shape (len(x), len(y))
+    k = np.asarray(k, dtype=np.float64).reshape(-1, 2)
+    X = np.exp(1j * np.outer(x, k[:,0]))
+    Y = np.exp(1j * np.outer(y, k[:,1]))
+    if amplitudes is not None:
+        X = X * amplitudes
+    return X.astype(dtype) @ Y.T.astype(dtype)
+
+
+def sinusoids(k, x, y, phases=None, amplitudes=None, dtype=np.float32):
+    # Real field sum_j amplitudes[j] * cos(k[j,0] x + k[j,1] y + phases[j]) of shape (len(x), len(y)), using
+    # cos(u + v) = cos u cos v - sin u sin v
+    k = np.asarray(k, dtype=np.float64).reshape(-1, 2)
+    u = np.outer(x, k[:,0])
+    if phases is not None:
+        u = u + phases
+    v = np.outer(y, k[:,1])
+    X = np.concatenate([np.cos(u), -np.sin(u)], axis=1)
+    if amplitudes is not None:
+        X = X * np.tile(amplitudes, 2)
+    Y = np.concatenate([np.cos(v), np.sin(v)], axis=1)
+    return X.astype(dtype) @ Y.T.astype(dtype)
+
+
+def sine_squares(k, x, y, amplitudes=None, dtype=np.float32):
+    # Sum of amplitudes[j] * sin(k[j,0] x + k[j,1] y)**2, which is (1 - cos(2 (k x)))/2 per term, e.g. the
+    # intensity of several exposures of a grating
+    k = np.asarray(k, dtype=np.float64).reshape(-1, 2)
+    total = len(k) if amplitudes is None else np.sum(amplitudes)
+    return (total / 2 - sinusoids(2 * k, x, y, amplitudes=amplitudes, dtype=dtype) / 2).astype(dtype)
+
+
+if __name__ == '__main__':
+    # Compare against the full grid evaluation of diffraction_1
+    width, height, s = 768, 768, 0.15
+    k = wave_vectors(np.arange(7) * 2.5 * np.pi / 7, s)
+
+    start = time.perf_counter()
+    coords = np.mgrid[-width:width, -height:height].transpose([1,2,0]) * s
+    reference = np.abs(np.sum([np.exp(np.sum(1j * coords * (kx / s, ky / s), axis=2)) for kx, ky in k], axis=0))
+    print(f'full grid: {time.perf_counter() - start:.3f}s')
+
+    start = time.perf_counter()
+    I = np.abs(plane_waves(k, grid_axis(width), grid_axis(height)))
+    print(f'plane_waves: {time.perf_counter() - start:.4f}s, maximum difference {np.abs(I - reference).max():.2e}')
+
+    # Gratings of diffraction_3
+    angles = np.cumsum([0.3, 0.9, 0.3, 0.9, 0.3])
+    k = 2 * np.pi * np.sin(0.35) / 13.26 * np.stack([-np.sin(angles), np.cos(angles)], axis=-1)
+    coords = np.mgrid[-width:width, -height:height].transpose([1,2,0]) * 0.5
+    start = time.perf_counter()
+    reference = np.sum([np.square(np.sin(np.sum(coords * kj, axis=2))) for kj in k], axis=0)
+    print(f'full grid: {time.perf_counter() - start:.3f}s')
+    start = time.perf_counter()
+    I = sine_squares(k, grid_axis(width, 0.5), grid_axis(height, 0.5))
+    print(f'sine_squares: {time.perf_counter() - start:.4f}s, maximum difference {np.abs(I - reference).max():.2e}')
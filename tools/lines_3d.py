@@ -0,0 +1,63 @@
+import numpy as np
+
+from project_3d import project
+from batch_draw import draw_segments
+
+
+# Depth sorted line drawings of 3D curves and wireframes: project the points, connect them to segments, sort the
+# segments from back to front by the depth of their midpoints and draw them in one batch with depth dependent
+# stroke width and shade.
+
+
+def path_edges(n_points, closed=True):
+    # Index pairs of consecutive points along a path
+    i = np.arange(n_points if closed else n_points - 1)
+    return np.stack([i, (i + 1) % n_points], axis=1)
+
+
+def depth_sorted_segments(points, z, edges=None, closed=True):
+    # points (n, 2) are screen coordinates and z (n,) depths as returned by project(). edges is an (m, 2) array of
+    # point indices and defaults to a path through all points. Returns the segments (m, 2, 2), their depths and
+    # the sort order (to reorder other per segment values), from back to front
+    if edges is None:
+        edges = path_edges(len(points), closed)
+    edges = np.asarray(edges)
+    z_lines = (z[edges[:,0]] + z[edges[:,1]]) / 2
+    order = np.argsort(z_lines)
+    return points[edges[order]], z_lines[order], order
+
+
+def depth_ratios(z_lines, radius=None):
+    # Relative depth from 0 (back) to 1 (front), either stretched over the depth range of the segments or
+    # measured from the middle of a sphere with the given radius, so the shading stays put as the object turns
+    z_min, z_max = z_lines.min(), z_lines.max()
+    if radius is None:
+        return (z_lines - z_min) / (z_max - z_min)
+    return (radius + z_lines - (z_min + z_max)/2) / (2*radius)
+
+
+def gray(shades):
+    shades = np.asarray(shades, dtype=np.float64)
+    return np.repeat(shades[...,None], 3, axis=-1) if shades.ndim == 1 else shades
+
+
+def draw_depth_sorted(surface, segments, ratios, stroke_width=lambda z: 3 + 3*z, stroke=lambda z: 0.3 + 0.7*z,
+                      line_cap='round'):
+    # stroke_width and stroke are constants or functions of the relative depth. A stroke function can return gray
+    # values (m,) or colors (m, 3|4)
+    widths = stroke_width(ratios) if callable(stroke_width) else stroke_width
+    colors = gray(stroke(ratios)) if callable(stroke) else stroke
+    draw_segments(surface, segments[:,0], segments[:,1], stroke=colors, stroke_width=widths, line_cap=line_cap)
+
+
+def draw_lines_3d(surface, points, C, screen_size=None, edges=None, closed=True, radius=None,
+                  stroke_width=lambda z: 3 + 3*z, stroke=lambda z: 0.3 + 0.7*z, line_cap='round'):
+    # points is a (4, n) array of homogeneous coordinates and C a camera matrix from get_camera_matrix.
+    # screen_size is the (width, height) of the viewport in drawing coordinates, by default the surface size.
+    # Returns the projected points and their depths
+    if screen_size is None:
+        screen_size = (surface.width, surface.height)
+    points, z = project(C, points, screen_size)
+    segments, z_lines, _ = depth_sorted_segments(points, z, edges, closed)
+    draw_depth_sorted(surface, segments, depth_ratios(z_lines, radius), stroke_width, stroke, line_cap)
+    return points, z
@@ -0,0 +1,192 @@
+import os, sys, csv, time
+import functools
+from collections import defaultdict, Counter
+
+
+# Opt-in timing of the stages of a render: geometry helpers, gizeh drawing, get_npimage, resizing and writing to
+# ffmpeg. Enable it with profile=True on render_webm/render_video or the PROFILE_STAGES environment variable.
+#
+# The common tools entry points are wrapped with timers when the render starts, also where pieces imported them
+# by name. Stages nest: time spent in a stage called from another one (e.g. draw_segments inside draw_lines_3d)
+# is only counted as self time of the inner one, and the self time of 'frame' is what the piece computes itself
+# (NumPy, shapely). At the end of the render a summary is printed and written next to the video:
+#   <name>.stacks.txt    self time per stack in microseconds, in the folded format flamegraph.pl reads
+#   <name>.profile.csv   one row per rendered frame with the time of every stage in that frame
+
+tools_dir = os.path.dirname(os.path.abspath(__file__))
+
+# (module, class or None, attribute, stage) of the wrapped entry points. Modules that are not loaded are skipped
+entry_points = [
+    ('gizeh', 'Element', 'draw', 'gizeh draw'),
+    ('gizeh', 'Surface', 'get_npimage', 'get_npimage'),
+    ('skimage.transform', None, 'resize', 'resize'),
+    ('rendering', None, 'downsample', 'resize'),
+    ('stippling', None, 'stipple_image_points', 'stipple'),
+    ('project_3d', None, 'project', 'project'),
+    ('geometry', None, 'de_boor', 'de_boor'),
+    ('geometry', None, 'de_boor_np', 'de_boor'),
+    ('spline', None, 'bspline', 'bspline'),
+    ('rendering', None, 'blend_keyframes', 'keyframes'),
+    ('batch_draw', None, 'draw_circles', 'batch draw'),
+    ('batch_draw', None, 'draw_polylines', 'batch draw'),
+    ('batch_draw', None, 'draw_segments', 'batch draw'),
+    ('splatting', None, 'splat_dots', 'splat dots'),
+    ('lines_3d', None, 'draw_lines_3d', 'lines 3d'),
+    ('interference', None, 'plane_waves', 'interference'),
+    ('interference', None, 'sine_squares', 'interference'),
+    ('chladni', None, 'get_chladni_pattern', 'chladni'),
+    ('spectrum', None, 'fft_magnitude', 'fft'),
+    ('grids', None, 'circle_mask', 'masks'),
+]
+
+_stack = []
+self_times = defaultdict(float)
+calls = Counter()
+frame_rows = []
+_frame = None
+
+
+def profiling_enabled(profile=None):
+    if profile is None:
+        return bool(os.environ.get('PROFILE_STAGES'))
+    return profile
+
+
+def enter(name):
+    _stack.append([name, time.perf_counter(), 0.0])
+
+
+def leave():
+    name, start, children = _stack.pop()
+    elapsed = time.perf_counter() - start
+    path = ';'.join([s[0] for s in _stack] + [name])
+    self_times[path] += elapsed - children
+    calls[path] += 1
+    if _stack:
+        _stack[-1][2] += elapsed
+    if _frame is not None:
+        _frame[name] += elapsed
+
+
+class stage():
+    # with stage('name'): ...
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        enter(self.name)
+
+    def __exit__(self, *exc):
+        leave()
+
+
+def timed(name, function):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        # Recursive calls (de_boor) and calls from a stage of the same name count once
+        if any(s[0] == name for s in _stack):
+            return function(*args, **kwargs)
+        enter(name)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            leave()
+    wrapper.profiled_stage = name
+    return wrapper
+
+
+def instrument(namespace=None):
+    # Wrap the entry points in their modules, in all loaded tools modules and in namespace (a piece's globals)
+    namespaces = [vars(m) for m in list(sys.modules.values())
+                  if os.path.dirname(os.path.abspath(getattr(m, '__file__', None) or '')) == tools_dir]
+    if namespace is not None:
+        namespaces.append(namespace)
+
+    for module_name, class_name, attribute, name in entry_points:
+        owner = sys.modules.get(module_name)
+        if owner is not None and class_name is not None:
+            owner = getattr(owner, class_name, None)
+        original = getattr(owner, attribute, None)
+        if original is None or hasattr(original, 'profiled_stage'):
+            continue
+        wrapper = timed(name, original)
+        setattr(owner, attribute, wrapper)
+        for ns in namespaces:
+            for key, value in list(ns.items()):
+                if value is original:
+                    ns[key] = wrapper
+
+
+def _piece_globals(make_frame):
+    # The piece's function, also when wrapped by the frame cache
+    return getattr(getattr(make_frame, 'make_frame', make_frame), '__globals__', None)
+
+
+class ProfiledMakeFrame():
+    # Times every call of make_frame as the 'frame' stage and keeps one row of stage times per frame
+    def __init__(self, make_frame):
+        self.make_frame = make_frame
+
+    def __setstate__(self, state):
+        # Unpickled in a spawned render worker, which imported the piece and the tools modules without timers
+        self.__dict__.update(state)
+        instrument(_piece_globals(self.make_frame))
+
+    def __call__(self, t):
+        global _frame
+        _frame = Counter()
+        enter('frame')
+        try:
+            return self.make_frame(t)
+        finally:
+            leave()
+            frame_rows.append(dict(_frame, t=t))
+            _frame = None
+
+
+def profiled_make_frame(make_frame, profile=None):
+    if not profiling_enabled(profile) or isinstance(make_frame, ProfiledMakeFrame):
+        return make_frame
+    instrument(_piece_globals(make_frame))
+    return ProfiledMakeFrame(make_frame)
+
+
+def take_stats():
+    # Collected stats of this process, which are reset. Render workers send them back with their frames
+    stats = (dict(self_times), dict(calls), list(frame_rows))
+    self_times.clear()
+    calls.clear()
+    frame_rows.clear()
+    return stats
+
+
+def merge_stats(stats):
+    times, counts, rows = stats
+    for path, seconds in times.items():
+        self_times[path] += seconds
+    calls.update(counts)
+    frame_rows.extend(rows)
+
+
+def report(filename, file=sys.stdout):
+    stages = defaultdict(float)
+    stage_calls = Counter()
+    for path, seconds in self_times.items():
+        stages[path.split(';')[-1]] += seconds
+        stage_calls[path.split(';')[-1]] += calls[path]
+    total = sum(stages.values())
+
+    print(f'Stage profile ({len(frame_rows)} frames, self time):', file=file)
+    for name, seconds in sorted(stages.items(), key=lambda item: -item[1]):
+        print(f'  {name:16} {seconds:9.2f}s {100 * seconds / max(total, 1e-9):5.1f}%   {stage_calls[name]:9} calls', file=file)
+
+    with open(f'{filename}.stacks.txt', 'w') as f:
+        for path, seconds in sorted(self_times.items()):
+            f.write(f'{path} {int(round(seconds * 1e6))}\n')
+
+    columns = ['t', 'frame'] + sorted(set(key for row in frame_rows for key in row) - {'t', 'frame'})
+    with open(f'{filename}.profile.csv', 'w', newline='') as f:
+        writer = csv.DictWriter(f, columns, restval=0)
+        writer.writeheader()
+        for row in sorted(frame_rows, key=lambda row: row['t']):
+            writer.writerow({key: round(value, 6) for key, value in row.items()})
@@ -1,15 +1,18 @@
 import os, shutil, time
 import subprocess
+from collections import deque
 from multiprocessing import Pool
 from PIL import Image
 import numpy as np
+from frame_cache import cached_make_frame, cache_enabled, evict
+import profiling
 basestring = str
 
 
 # Render videos
 
 import gizeh as gz
-import moviepy.editor as mpy
+import cairocffi as cairo
 
 webm_params = {
     '-y': None,
@@ -23,16 +26,196 @@ webm_params = {
     '-crf': '1',
 }
 
-def render_webm(filename, make_frame, duration, extra_params={}):
-    c = mpy.VideoClip(make_frame, duration=duration)
-    params = [str(p) for p in sum(dict(webm_params, **extra_params).items(), ()) if p is not None]
-    c.write_videofile(f'{filename}.webm',
-                      fps=int(dict(webm_params, **extra_params)['-framerate']),
-                      ffmpeg_params=params)
+def ffmpeg_params(params):
+    return [str(p) for p in sum(params.items(), ()) if p is not None]
+
+def to_rgb24(frame):
+    # Bring whatever make_frame returns into the layout ffmpeg expects on its raw input
+    frame = np.asarray(frame)
+    if frame.ndim == 2:
+        frame = np.tile(frame[:,:,None], (1,1,3))
+    if frame.dtype != np.uint8:
+        frame = np.clip(frame, 0, 255).astype(np.uint8)
+    return np.ascontiguousarray(frame[:,:,:3])
+
+
+# Every worker process keeps its own reference to the piece's make_frame. Under fork it is inherited,
+# under spawn the piece script is re-imported once per worker and make_frame is looked up by name.
+_make_frame = None
+
+def _init_worker(make_frame, surface_scale=None):
+    global _make_frame
+    _make_frame = make_frame
+    if surface_scale is not None:
+        ScaledSurface.scale = surface_scale
+        gz.Surface = ScaledSurface
+
+def _render_chunk(indices, fps):
+    # Stage timings collected in the worker travel back with the frames (empty unless profiling)
+    return [to_rgb24(_make_frame(n / fps)) for n in indices], profiling.take_stats()
+
+def _chunk_frames(result):
+    frames, stats = result.get()
+    profiling.merge_stats(stats)
+    return frames
+
+def render_indices(make_frame, indices, fps, processes=None, chunk_size=4, max_pending=None, surface_scale=None):
+    # Yields the frames with the given indices in order, rendering chunks of them in a process pool.
+    # At most max_pending chunks are in flight, so finished frames waiting for an earlier chunk stay bounded.
+    # With surface_scale, every worker draws on ScaledSurface (spawned workers do not inherit the replacement)
+    processes = processes or os.cpu_count()
+    if processes == 1:
+        for n in indices:
+            yield to_rgb24(make_frame(n / fps))
+        return
+
+    max_pending = max_pending or 2 * processes
+    chunks = [indices[i : i + chunk_size] for i in range(0, len(indices), chunk_size)]
+    with Pool(processes, initializer=_init_worker, initargs=(make_frame, surface_scale)) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(_render_chunk, (chunk, fps)))
+            if len(pending) >= max_pending:
+                yield from _chunk_frames(pending.popleft())
+        while pending:
+            yield from _chunk_frames(pending.popleft())
+
+
+# Symmetries let the renderer reuse frames instead of calling make_frame again. A piece declares one as
+# a module level dict called symmetry (or passes it to render_webm/render_video):
+#   {'period': 2.5}                             frame(t) == frame(t - 2.5)
+#   {'period': 1.5, 'transform': 'rot90'}       frame(t) == rot90(frame(t - 1.5))
+#   {'reverse': True, 'transform': 'flipud'}    frame(t) == flipud(frame(duration - t))
+# Before rendering, 'checks' (default 2) synthesized frames are compared against really rendered ones.
+
+frame_transforms = {
+    None: lambda frame: frame,
+    'rot90': lambda frame: np.rot90(frame, 1),
+    'rot180': lambda frame: frame[::-1, ::-1],
+    'rot270': lambda frame: np.rot90(frame, 3),
+    'fliplr': lambda frame: frame[:, ::-1],
+    'flipud': lambda frame: frame[::-1],
+    'transpose': lambda frame: frame.transpose(1,0,2),
+}
 
-def save_poster(filename, make_frame, t=0):
-    c = mpy.VideoClip(make_frame, duration=1)
-    c.save_frame(f'{filename}.jpg', t=t)
+def transform_frame(frame, transform=None, repeats=1):
+    # All supported transforms are of order 1, 2 or 4
+    for _ in range(repeats % 4 if transform is not None else 0):
+        frame = frame_transforms[transform](frame)
+    return np.ascontiguousarray(frame)
+
+def get_symmetry_plan(n_frames, fps, symmetry=None):
+    # For every frame: index of the rendered frame it is taken from and how often the transform is applied
+    n = np.arange(n_frames)
+    if symmetry is None:
+        return n, np.zeros(n_frames, dtype=int)
+    if symmetry.get('transform') not in frame_transforms:
+        raise ValueError(f'Unknown frame transform {symmetry["transform"]}')
+
+    if 'period' in symmetry:
+        period = symmetry['period'] * fps
+        if period < 1 or not float(period).is_integer():
+            raise ValueError(f'Symmetry period of {symmetry["period"]}s is not a whole number of frames at {fps} fps')
+        return n % int(period), n // int(period)
+    elif symmetry.get('reverse'):
+        mirrored = n > n_frames - n
+        return np.where(mirrored, n_frames - n, n), mirrored.astype(int)
+    raise ValueError(f'Unknown symmetry {symmetry}')
+
+def check_symmetry(make_frame, duration, symmetry, fps=50, n_samples=2, tolerance=4):
+    # Spot-check synthesized frames against really rendered ones, returns False on mismatch
+    n_frames = int(np.ceil(duration * fps))
+    source, repeats = get_symmetry_plan(n_frames, fps, symmetry)
+    synthesized = np.flatnonzero(source != np.arange(n_frames))
+    for n in np.random.choice(synthesized, min(n_samples, len(synthesized)), replace=False):
+        real = to_rgb24(make_frame(n / fps)).astype(int)
+        synth = transform_frame(to_rgb24(make_frame(source[n] / fps)), symmetry.get('transform'), repeats[n])
+        diff = np.max(np.abs(real - synth)) if real.shape == synth.shape else np.inf
+        print(f'Symmetry check: frame {n} synthesized from frame {source[n]}, maximum difference {diff}')
+        if diff > tolerance:
+            return False
+    return True
+
+def get_piece_symmetry(make_frame, symmetry=None, duration=None, fps=50):
+    if symmetry is None:
+        symmetry = getattr(make_frame, '__globals__', {}).get('symmetry')
+    if symmetry is not None and not check_symmetry(make_frame, duration, symmetry, fps, symmetry.get('checks', 2)):
+        print(f'Symmetry {symmetry} does not hold, rendering all frames')
+        return None
+    return symmetry
+
+def render_frames(make_frame, duration, fps, processes=None, chunk_size=4, max_pending=None, symmetry=None):
+    # Yields all frames of the animation in order. Frames covered by the symmetry are synthesized from
+    # earlier ones, which are kept in memory until their last use.
+    n_frames = int(np.ceil(duration * fps))
+    source, repeats = get_symmetry_plan(n_frames, fps, symmetry)
+    rendered = [n for n in range(n_frames) if source[n] == n]
+    frames = render_indices(make_frame, rendered, fps, processes, chunk_size, max_pending)
+    if len(rendered) == n_frames:
+        yield from frames
+        return
+
+    last_use = {s: n for n, s in enumerate(source)}
+    stored = {}
+    for n in range(n_frames):
+        if source[n] == n:
+            frame = next(frames)
+            if last_use[n] > n:
+                stored[n] = frame
+        else:
+            frame = transform_frame(stored[source[n]], symmetry.get('transform'), repeats[n])
+            if last_use[source[n]] == n:
+                del stored[source[n]]
+        yield frame
+
+def open_ffmpeg_pipe(output_args, size, fps):
+    # Single ffmpeg process reading raw RGB frames from stdin
+    w, h = size
+    return subprocess.Popen(['ffmpeg', '-y', '-loglevel', 'error',
+                             '-f', 'rawvideo', '-vcodec', 'rawvideo', '-pix_fmt', 'rgb24',
+                             '-s', f'{w}x{h}', '-framerate', str(fps), '-i', '-'] + output_args,
+                            stdin=subprocess.PIPE)
+
+def write_frames(output_args, frames, fps, n_frames=None, label=''):
+    proc = None
+    try:
+        for n, frame in enumerate(frames):
+            if proc is None:
+                proc = open_ffmpeg_pipe(output_args, (frame.shape[1], frame.shape[0]), fps)
+            with profiling.stage('ffmpeg write'):
+                proc.stdin.write(frame.tobytes())
+            if n_frames:
+                print(f'\rRendering {label}: frame {n+1}/{n_frames}', end='', flush=True)
+    finally:
+        if proc is not None:
+            proc.stdin.close()
+            proc.wait()
+    if n_frames:
+        print()
+    if proc is not None and proc.returncode != 0:
+        raise RuntimeError(f'ffmpeg exited with code {proc.returncode} while writing {label}')
+
+# Set cache=True (or the FRAME_CACHE environment variable) to keep rendered frames on disk, see frame_cache.py
+# Set profile=True (or the PROFILE_STAGES environment variable) to time the stages of each frame, see profiling.py
+# Set preview=True (or the PREVIEW environment variable) to render a quick draft instead, see render_preview
+def render_webm(filename, make_frame, duration, extra_params={}, processes=None, cache=None, symmetry=None, profile=None, preview=None):
+    params = dict(webm_params, **extra_params)
+    fps = int(params.pop('-framerate'))
+    if preview_enabled(preview):
+        return render_preview(filename, make_frame, duration, full_fps=fps, processes=processes)
+    symmetry = get_piece_symmetry(make_frame, symmetry, duration, fps)
+    profiling.take_stats()
+    make_frame = profiling.profiled_make_frame(cached_make_frame(make_frame, cache), profile)
+    frames = render_frames(make_frame, duration, fps, processes=processes, symmetry=symmetry)
+    write_frames(ffmpeg_params(params) + [f'{filename}.webm'], frames, fps,
+                 n_frames=int(np.ceil(duration * fps)), label=f'{filename}.webm')
+    if cache_enabled(cache):
+        evict()
+    if profiling.profiling_enabled(profile):
+        profiling.report(filename)
+
+def save_poster(filename, make_frame, t=0, type='jpg', cache=None):
+    Image.fromarray(to_rgb24(cached_make_frame(make_frame, cache)(t))).save(f'{filename}.{type}')
 
 mp4_params = {
     '-y': None,
@@ -47,9 +230,234 @@ mp4_params = {
 
 def convert_to_mp4(filename, extra_params={}):
     print(f'Creating .mp4 version of "{filename}.webm"')
-    params = [str(p) for p in sum(dict(mp4_params, **extra_params).items(), ()) if p is not None]
+    params = ffmpeg_params(dict(mp4_params, **extra_params))
     subprocess.call(['ffmpeg', '-i', f'{filename}.webm'] + params + [f'{filename}.mp4',])
 
+def render_video(filename, make_frame, duration, webm_extra_params={}, mp4_extra_params={}, poster_t=0, processes=None, cache=None, symmetry=None, profile=None, preview=None):
+    # Encode .webm and .mp4 from one raw frame stream in a single ffmpeg process (one output per
+    # encoder), instead of render_webm followed by convert_to_mp4 decoding the finished .webm again.
+    # The poster is taken from the same stream when poster_t falls on a frame, pass None to skip it.
+    webm = dict(webm_params, **webm_extra_params)
+    fps = int(webm.pop('-framerate'))
+    if preview_enabled(preview):
+        return render_preview(filename, make_frame, duration, full_fps=fps, processes=processes)
+    mp4 = dict(mp4_params, **mp4_extra_params)
+    output_args = ffmpeg_params(webm) + [f'{filename}.webm'] + ffmpeg_params(mp4) + [f'{filename}.mp4']
+
+    n_frames = int(np.ceil(duration * fps))
+    symmetry = get_piece_symmetry(make_frame, symmetry, duration, fps)
+    profiling.take_stats()
+    make_frame = profiling.profiled_make_frame(cached_make_frame(make_frame, cache), profile)
+    poster_index = None
+    if poster_t is not None:
+        if float(poster_t * fps).is_integer() and 0 <= poster_t * fps < n_frames:
+            poster_index = int(poster_t * fps)
+        else:
+            save_poster(filename, make_frame, t=poster_t)
+
+    def frames_with_poster(frames):
+        for n, frame in enumerate(frames):
+            if n == poster_index:
+                Image.fromarray(frame).save(f'{filename}.jpg')
+            yield frame
+
+    frames = render_frames(make_frame, duration, fps, processes=processes, symmetry=symmetry)
+    write_frames(output_args, frames_with_poster(frames), fps,
+                 n_frames=n_frames, label=f'{filename}.webm/.mp4')
+    if cache_enabled(cache):
+        evict()
+    if profiling.profiling_enabled(profile):
+        profiling.report(filename)
+
+
+# Supersampling: fields computed at factor times the frame size are reduced by averaging factor x factor blocks
+# (an exact box filter) in float32, instead of the interpolating float64 resample of skimage.transform.resize.
+# With threads > 1 bands of rows are reduced in parallel, NumPy releases the GIL while doing so.
+
+def _in_bands(function, out, I, factor, threads=None):
+    # function(out_band, I_band) on bands of output rows, I has factor times as many rows as out
+    if threads is None or threads <= 1:
+        function(out, I)
+        return out
+    from concurrent.futures import ThreadPoolExecutor
+    edges = np.linspace(0, len(out), threads + 1).astype(int)
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(lambda i: function(out[edges[i]:edges[i+1]], I[edges[i] * factor : edges[i+1] * factor]),
+                          range(threads)))
+    return out
+
+def _box_reduce(out, I):
+    # Summing strided slices, first over rows then over columns, is several times faster than a reshape and mean
+    factor = I.shape[0] // out.shape[0]
+    rows = I[0::factor].astype(np.float32)
+    for i in range(1, factor):
+        rows += I[i::factor]
+    out[:] = rows[:,0::factor]
+    for j in range(1, factor):
+        out += rows[:,j::factor]
+    out *= 1 / factor**2
+
+def downsample(I, factor=2, threads=None):
+    # Mean over factor x factor blocks, in float32. Rows and columns beyond a multiple of factor are dropped
+    I = np.asarray(I)
+    h, w = I.shape[0] // factor, I.shape[1] // factor
+    out = np.empty((h, w) + I.shape[2:], dtype=np.float32)
+    return _in_bands(_box_reduce, out, I[:h * factor, :w * factor], factor, threads)
+
+def supersampled_frame(I, factor=2, mask=None, scale=255, channels=3, threads=None):
+    # Frame of a grayscale field at factor times the frame size: downsample, multiply by the mask and by scale
+    # and convert to uint8 (truncating like astype), as an (h, w, channels) array
+    I = downsample(I, factor, threads)
+    if mask is not None:
+        I *= mask
+    if scale != 1:
+        I *= scale
+    np.clip(I, 0, 255, out=I)
+    return np.repeat(I.astype(np.uint8)[:,:,None], channels, axis=2)
+
+
+# Draft previews: the loop at a fraction of the resolution and frame rate, encoded with a fast x264 preset, or a
+# contact sheet of frames spread over the loop. Set PREVIEW=1 (or PREVIEW=sheet) to make render_webm and
+# render_video of any piece render a preview instead, PREVIEW_SCALE and PREVIEW_FPS change the defaults.
+#
+# While rendering, gz.Surface is replaced by ScaledSurface, so pieces keep drawing in full size coordinates on
+# smaller surfaces. Its width and height stay the full size, the size in pixels is pixel_width and pixel_height.
+# Frames that still come out in another size (NumPy pieces, Surface.from_image) are resized.
+
+preview_params = {
+    '-y': None,
+    '-an': None,
+    '-vcodec': 'libx264',
+    '-pix_fmt': 'yuv420p',
+    '-preset': 'ultrafast',
+    '-crf': '26',
+    '-vf': 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+}
+
+_gizeh_surface = gz.Surface
+
+class _ScaledContext(cairo.Context):
+    # gizeh sets the matrix of each element on the context, the scaling is applied after it
+    def __init__(self, target, scale):
+        super().__init__(target)
+        self._scaling = cairo.Matrix(scale, 0, 0, scale, 0, 0)
+        self.set_matrix(cairo.Matrix())
+
+    def set_matrix(self, matrix):
+        super().set_matrix(matrix.multiply(self._scaling))
+
+    def identity_matrix(self):
+        self.set_matrix(cairo.Matrix())
+
+class ScaledSurface(_gizeh_surface):
+    scale = 1.0
+
+    def __init__(self, width, height, bg_color=None):
+        self.pixel_width, self.pixel_height = max(1, round(width * self.scale)), max(1, round(height * self.scale))
+        super().__init__(self.pixel_width, self.pixel_height)
+        self.width, self.height = width, height
+        if bg_color:
+            gz.rectangle(2*width, 2*height, fill=bg_color).draw(self)
+
+    def get_new_context(self):
+        return _ScaledContext(self._cairo_surface, self.scale)
+
+    def get_npimage(self, transparent=False, y_origin='top'):
+        # gizeh reshapes the pixel data with width and height
+        width, height = self.width, self.height
+        self.width, self.height = self.pixel_width, self.pixel_height
+        try:
+            return super().get_npimage(transparent, y_origin)
+        finally:
+            self.width, self.height = width, height
+
+    @staticmethod
+    def from_image(image):
+        # Images keep their resolution, also in ImagePattern; frames drawn on them are resized afterwards
+        scale, ScaledSurface.scale = ScaledSurface.scale, 1.0
+        try:
+            return _gizeh_surface.from_image(image)
+        finally:
+            ScaledSurface.scale = scale
+
+class scaled_surfaces():
+    # with scaled_surfaces(0.5): ... Pool workers forked inside inherit the replaced gz.Surface, spawned ones get it
+    # from render_indices(..., surface_scale=0.5)
+    def __init__(self, scale):
+        self.scale = scale
+
+    def __enter__(self):
+        ScaledSurface.scale = self.scale
+        gz.Surface = ScaledSurface
+
+    def __exit__(self, *exc):
+        gz.Surface = _gizeh_surface
+
+class PreviewMakeFrame():
+    # Brings every frame to the preview size
+    def __init__(self, make_frame, size):
+        self.make_frame = make_frame
+        self.size = size
+
+    def __call__(self, t):
+        frame = to_rgb24(self.make_frame(t))
+        if (frame.shape[1], frame.shape[0]) != self.size:
+            frame = np.asarray(Image.fromarray(frame).resize(self.size, Image.BILINEAR))
+        return frame
+
+def preview_enabled(preview=None):
+    if preview is None:
+        return os.environ.get('PREVIEW', '') not in ['', '0']
+    return preview
+
+def contact_sheet(frames, columns=6):
+    frames = list(frames)
+    h, w = frames[0].shape[:2]
+    rows = int(np.ceil(len(frames) / columns))
+    sheet = np.zeros((rows * h, columns * w, 3), dtype=np.uint8)
+    for n, frame in enumerate(frames):
+        sheet[(n // columns) * h : (n // columns + 1) * h, (n % columns) * w : (n % columns + 1) * w] = frame
+    return sheet
+
+def render_preview(filename, make_frame, duration, scale=None, fps=None, sheet=None, full_fps=50, processes=None,
+                   n_samples=3, columns=6):
+    # Writes <filename>.preview.mp4 (or .preview.png with sheet=True, columns x columns frames) and prints the
+    # projected time of the full render, from the per-frame cost of n_samples frames at full resolution
+    scale = scale or float(os.environ.get('PREVIEW_SCALE', 0.5))
+    fps = fps or int(os.environ.get('PREVIEW_FPS', 10))
+    sheet = os.environ.get('PREVIEW') == 'sheet' if sheet is None else sheet
+    processes = processes or os.cpu_count()
+
+    # Full resolution samples, the first one includes lazy loading and is left out if there are more
+    times = []
+    for t in np.linspace(0, duration, n_samples, endpoint=False):
+        start = time.perf_counter()
+        frame = to_rgb24(make_frame(t))
+        times.append(time.perf_counter() - start)
+    full_cost = np.mean(times[1:] or times)
+    full_frames = int(np.ceil(duration * full_fps))
+    size = (max(1, round(frame.shape[1] * scale)), max(1, round(frame.shape[0] * scale)))
+
+    start = time.perf_counter()
+    with scaled_surfaces(scale):
+        preview_make_frame = PreviewMakeFrame(make_frame, size)
+        if sheet:
+            n_frames = columns * columns
+            indices = [n * duration * fps / n_frames for n in range(n_frames)]
+            frames = render_indices(preview_make_frame, indices, fps, processes, surface_scale=scale)
+            Image.fromarray(contact_sheet(frames, columns)).save(f'{filename}.preview.png')
+            label = f'{filename}.preview.png'
+        else:
+            n_frames = int(np.ceil(duration * fps))
+            frames = render_indices(preview_make_frame, list(range(n_frames)), fps, processes, surface_scale=scale)
+            label = f'{filename}.preview.mp4'
+            write_frames(ffmpeg_params(preview_params) + [label], frames, fps, n_frames=n_frames, label=label)
+    seconds = time.perf_counter() - start
+
+    print(f'Preview {label}: {n_frames} frames of {size[0]}x{size[1]} in {seconds:.1f}s')
+    print(f'Full render: {full_frames} frames of {frame.shape[1]}x{frame.shape[0]} at {full_cost:.3f}s per frame, '
+          f'projected {full_cost * full_frames / processes / 60:.1f} min on {processes} processes (without encoding)')
+
 
 # Interpolation functions
 
@@ -102,7 +510,7 @@ def interval_progresses(progress, n_intervals, interpolation=None):
     return p
 
 def weight_function(progress, peak, radius, interpolation=None):
-    d = min(1.0, max(0.0, float(abs(peak - progress)) / radius))
+    d = np.minimum(1.0, np.maximum(0.0, np.abs(peak - progress) / radius))
     return 1.0 - interpolate(d, interpolation)
 
 
@@ -118,6 +526,24 @@ def equidistant_weight_functions(progress, n_points, interpolation=None):
     return p
 
 
+def active_keyframes(progress, n_keyframes, interpolation=None):
+    # Of the equidistant weight functions at most two neighbouring ones are non-zero. Returns their indices and
+    # weights, each of shape progress.shape + (2,), with the same values as equidistant_weight_functions
+    progress = np.asarray(progress, dtype=np.float64)
+    i = np.minimum((np.clip(progress, 0, 1) * (n_keyframes - 1)).astype(int), n_keyframes - 2)
+    indices = np.stack([i, i + 1], axis=-1)
+    weights = weight_function(progress[...,None], indices / (n_keyframes - 1), 1.0 / (n_keyframes - 1), interpolation)
+    return indices, weights
+
+def blend_keyframes(progress, keyframes, interpolation=None):
+    # Interpolate between equidistant keyframes (n_keyframes, ...) using only the two active ones. For an array
+    # of progress values the result has shape progress.shape + (...)
+    keyframes = np.asarray(keyframes)
+    indices, weights = active_keyframes(progress, len(keyframes), interpolation)
+    weights = weights.reshape(weights.shape + (1,) * (keyframes.ndim - 1))
+    return (keyframes[indices] * weights).sum(axis=indices.ndim - 1)
+
+
 # def render_one_frame(args):
 #   n, total_frames, render_frame, output_path = args
 
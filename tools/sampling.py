@@ -0,0 +1,43 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+# Initial point sets for stippling. All samplers return an (n_samples, 2) array of (y, x) in [0, 1), where
+# pixel (i, j) of the density covers [i/h, (i+1)/h) x [j/w, (j+1)/w) like in stippling.rejection_sampling.
+
+
+def inverse_cdf_sampling(density, n_samples):
+    # Draw pixels proportionally to their density from the flattened cumulative distribution,
+    # then jitter uniformly inside each pixel
+    h, w = density.shape[:2]
+    cdf = np.cumsum(density, axis=None, dtype=np.float64)
+    indices = np.searchsorted(cdf, np.random.rand(n_samples) * cdf[-1], side='right')
+    y, x = np.divmod(np.minimum(indices, h*w - 1), w)
+    return np.stack([(y + np.random.rand(n_samples)) / h, (x + np.random.rand(n_samples)) / w], axis=1)
+
+
+def blue_noise_sampling(density, n_samples, oversampling=4):
+    # Density adaptive blue noise by sample elimination: draw oversampling * n_samples candidates and
+    # repeatedly drop the candidates closest to their nearest neighbour, relative to the spacing
+    # 1/sqrt(density) expected at that position, until n_samples remain
+    h, w = density.shape[:2]
+    samples = inverse_cdf_sampling(density, oversampling * n_samples)
+    spacing = 1 / np.sqrt(np.maximum(density[(samples[:,0] * h).astype(int), (samples[:,1] * w).astype(int)], 1e-6))
+
+    while len(samples) > n_samples:
+        dists, neighbours = cKDTree(samples * (h, w)).query(samples * (h, w), k=2)
+        crowding = dists[:,1] / spacing
+        # Drop the most crowded tenth, but only one point of each closest pair
+        n_drop = min(len(samples) - n_samples, max(1, len(samples) // 10))
+        candidates = np.argsort(crowding)[:2 * n_drop]
+        keep = np.ones(len(samples), dtype=bool)
+        dropped = 0
+        for i in candidates:
+            if dropped == n_drop:
+                break
+            if keep[neighbours[i,1]]:
+                keep[i] = False
+                dropped += 1
+        samples, spacing = samples[keep], spacing[keep]
+
+    return samples
@@ -0,0 +1,85 @@
+import time
+import multiprocessing
+from functools import lru_cache
+import numpy as np
+import scipy.fft
+from PIL import Image
+
+from rendering import downsample
+
+
+# Magnitude spectra of rasterized images, as in the 2d_fft pieces. The FFT of a real image is Hermitian,
+# F[u, v] == conj(F[-u, -v]), so only the rfft2 half of the columns is computed and the other half of the
+# magnitude is mirrored from it. Transforms run in float32 on scipy.fft workers: all cores in the main process
+# (posters, previews), one per render worker process, which already render frames in parallel.
+
+
+def fft_workers():
+    return 1 if multiprocessing.parent_process() is not None else -1
+
+
+@lru_cache(maxsize=8)
+def _buffers(shape):
+    # float32 input and the row indices -u mod h of the mirrored half, per image shape
+    return np.empty(shape, dtype=np.float32), -np.arange(shape[0]) % shape[0]
+
+
+def fft_magnitude(image, scale=1.0, workers=None):
+    # |fft2(image * scale)| of a real 2D image as float32
+    h, w = image.shape
+    scratch, mirrored_rows = _buffers(image.shape)
+    np.multiply(image, scale, out=scratch, casting='unsafe')
+    half = np.abs(scipy.fft.rfft2(scratch, workers=workers or fft_workers()))
+
+    I = np.empty((h, w), dtype=np.float32)
+    I[:,:w//2+1] = half
+    I[:,w//2+1:] = half[mirrored_rows, w - w//2 - 1 : 0 : -1]
+    return I
+
+
+def red_channel(surface):
+    # Red channel of a gizeh surface without the full RGBA copy of get_npimage (cairo stores pixels as BGRA), at
+    # the resolution of its cairo surface (smaller than width x height on preview surfaces)
+    cairo_surface = surface._cairo_surface
+    data = np.frombuffer(cairo_surface.get_data(), np.uint8)
+    data = data.reshape(cairo_surface.get_height(), cairo_surface.get_stride() // 4, 4)
+    return data[:, :cairo_surface.get_width(), 2]
+
+
+def surface_spectrum(surface, transform=None, factor=2, mask=None, workers=None):
+    # Magnitude spectrum of a gizeh surface with values 0..1, mapped by transform (e.g. a log), downsampled by
+    # factor to the frame size and multiplied by mask. The frame size is the shape of mask if given.
+    #
+    # Preview surfaces have fewer pixels than their size. Their spectrum is scaled to the magnitudes of the full
+    # size surface and resampled to the frame size, but it covers a smaller range of frequencies, so spectra in
+    # previews are only approximate.
+    image = red_channel(surface)
+    shape = mask.shape if mask is not None else (surface.height // factor, surface.width // factor)
+    I = fft_magnitude(image, surface.width * surface.height / image.size / 255, workers)
+    if transform is not None:
+        I = transform(I)
+    pixel_factor = image.shape[0] // shape[0]
+    if image.shape == (shape[0] * pixel_factor, shape[1] * pixel_factor):
+        if pixel_factor > 1:
+            I = downsample(I, pixel_factor)
+    else:
+        I = np.array(Image.fromarray(I.astype(np.float32, copy=False), 'F').resize(shape[::-1], Image.BILINEAR))
+    if mask is not None:
+        I *= mask
+    return I
+
+
+if __name__ == '__main__':
+    np.random.seed(0)
+    for shape in [(1536, 1536), (101, 64), (64, 101)]:
+        image = (np.random.rand(*shape) < 0.1) * 255
+
+        start = time.perf_counter()
+        reference = np.abs(np.fft.fft2(image / 255))
+        seconds = time.perf_counter() - start
+
+        fft_magnitude(image, 1/255)
+        start = time.perf_counter()
+        I = fft_magnitude(image, 1/255)
+        print(f'{shape}: fft2 {seconds:.4f}s, fft_magnitude {time.perf_counter() - start:.4f}s, '
+              f'maximum relative difference {np.abs(I - reference).max() / reference.max():.1e}')
@@ -0,0 +1,105 @@
+import time
+from functools import lru_cache
+import numpy as np
+import gizeh as gz
+
+from batch_draw import draw_circles
+
+
+# Pure NumPy renderer for large clouds of equally sized antialiased dots. Each dot's coverage is looked up in a
+# table of precomputed disc footprints, one per sub-pixel offset, and scattered into the frame with bincount.
+#
+# All dots have the same colour, so compositing them with the OVER operator is order independent: the
+# accumulated alpha is 1 - prod(1 - coverage). It is summed as log(1 - coverage) in a float32 image, so
+# overlaps composite as they would with cairo, up to the coverage estimate and 8 bit rounding.
+#
+# The coverage estimate is not exact: dot centers are rounded to 1/subpixel of a pixel, and for r=1.5 the
+# coverage of single dots differs from the exact disc area by up to 0.2 (mean 0.04 over the covered pixels).
+# That shows as slightly wobbling dots, so the pieces keep drawing with batch_draw.draw_circles and splatting
+# is opt-in, for drafts or dot counts where cairo is too slow. Compare both with exact=True before using it.
+
+
+@lru_cache(maxsize=None)
+def disc_kernels(radius, subpixel=4, samples=16):
+    # Coverage of a disc of the given radius, centered at each of subpixel x subpixel positions inside
+    # a pixel, estimated with samples x samples points per pixel. Shape (subpixel, subpixel, k, k)
+    R = int(np.ceil(radius))
+    k = 2 * R + 1
+    centers = (np.arange(subpixel) + .5) / subpixel
+    offsets = (np.arange(samples) + .5) / samples
+    # Sample positions relative to the pixel containing the disc center, along one axis
+    positions = (np.arange(-R, R + 1)[:,None] + offsets[None,:]).ravel()
+    d = positions[None,:] - centers[:,None]
+    inside = (d[:,None,:,None]**2 + d[None,:,None,:]**2) <= radius**2
+    kernels = inside.reshape(subpixel, subpixel, k, samples, k, samples).mean(axis=(3, 5))
+    return kernels.astype(np.float32)
+
+
+def splat_coverage(points, radius, width, height, subpixel=4, samples=16):
+    # Accumulated alpha (height, width) of dots at points (n, 2) in (x, y) pixel coordinates
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    kernels = disc_kernels(float(radius), subpixel, samples)
+    R = kernels.shape[-1] // 2
+
+    pixels = np.floor(points).astype(np.int64)
+    cells = np.minimum(((points - pixels) * subpixel).astype(np.int64), subpixel - 1)
+    weights = kernels[cells[:,1], cells[:,0]]
+
+    dy, dx = np.mgrid[-R:R+1, -R:R+1]
+    ys = pixels[:,1,None,None] + dy
+    xs = pixels[:,0,None,None] + dx
+    valid = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height) & (weights > 0)
+
+    # Full coverage would be log(0), so cap it slightly below one
+    log_transparency = np.log1p(-np.minimum(weights[valid], 1 - 1/1024))
+    accumulated = np.bincount(ys[valid] * width + xs[valid], log_transparency, minlength=width*height)
+    return 1 - np.exp(accumulated.astype(np.float32)).reshape(height, width)
+
+
+def splat_dots(points, radius, width, height, fill=(1,1,1), background=None, subpixel=4, samples=16, exact=False):
+    # Draw antialiased dots and return an RGB uint8 frame like surface.get_npimage(). background is an
+    # optional (height, width, 3) uint8 frame to draw on, e.g. text already drawn with gizeh.
+    # With exact=True the dots are drawn with cairo instead, for comparison.
+    if exact:
+        if background is None:
+            surface = gz.Surface(width, height)
+        else:
+            surface = gz.Surface.from_image(np.ascontiguousarray(background, dtype=np.uint8))
+        draw_circles(surface, points, radius, fill=fill)
+        return surface.get_npimage()
+
+    fill = np.asarray(fill, dtype=np.float32)
+    alpha = splat_coverage(points, radius, width, height, subpixel, samples)
+    if len(fill) == 4:
+        alpha *= fill[3]
+    alpha = alpha[:,:,None]
+    color = 255 * fill[None,None,:3]
+
+    if background is None:
+        frame = color * alpha
+    else:
+        frame = background[:,:,:3].astype(np.float32) * (1 - alpha) + color * alpha
+    return np.round(frame).astype(np.uint8)
+
+
+if __name__ == '__main__':
+    # Compare against cairo on a random point cloud
+    width, height, n_points, radius = 2560, 1440, 10000, 1.5
+    np.random.seed(0)
+    points = np.random.rand(n_points, 2) * (width, height)
+
+    start = time.perf_counter()
+    frame = splat_dots(points, radius, width, height)
+    print(f'NumPy splatting: {time.perf_counter() - start:.3f}s')
+    start = time.perf_counter()
+    frame = splat_dots(points, radius, width, height)
+    print(f'NumPy splatting (cached kernels): {time.perf_counter() - start:.3f}s')
+
+    covered = splat_coverage(points, radius, width, height).sum() / n_points
+    print(f'Mean coverage per dot {covered:.4f}, disc area {np.pi * radius**2:.4f} (lower where dots overlap)')
+
+    start = time.perf_counter()
+    reference = splat_dots(points, radius, width, height, exact=True)
+    print(f'cairo: {time.perf_counter() - start:.3f}s')
+    difference = np.abs(frame.astype(int) - reference.astype(int))
+    print(f'Maximum difference {difference.max()}, mean difference {difference.mean():.4f}')
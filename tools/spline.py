@@ -0,0 +1,95 @@
+import time
+from functools import lru_cache
+import numpy as np
+
+
+# Uniform B-splines evaluated as matrix products instead of the recursion in geometry.de_boor. For t = i + u the
+# curve is a weighted sum of the degree + 1 control points points[i - degree], ..., points[i], with weights that
+# are polynomials in u. Their coefficients are precomputed once per degree by running the de Boor recursion
+# on polynomials, so results match de_boor and de_boor_np (up to float rounding) for any t.
+#
+# Control points can carry extra axes, e.g. all point tracks of an animation as (n_keyframes, n_points, 2),
+# which are then evaluated together.
+
+
+def _times_linear(coefficients, c0, c1):
+    # Multiply polynomials (rows of coefficients for u**0, u**1, ...) by c0 + c1 * u
+    result = c0 * coefficients
+    result[:,1:] += c1 * coefficients[:,:-1]
+    return result
+
+
+@lru_cache(maxsize=None)
+def basis_matrix(degree):
+    # M[k, j] is the coefficient of u**j in the weight of points[i - degree + k]
+    def weights(d, m):
+        # Weights of the recursion step with degree d at index i - m
+        if d == 0:
+            w = np.zeros((degree + 1, degree + 1))
+            w[degree - m, 0] = 1
+            return w
+        denominator = degree + 1 - d
+        left = _times_linear(weights(d - 1, m + 1), 1 - m / denominator, -1 / denominator)
+        right = _times_linear(weights(d - 1, m), m / denominator, 1 / denominator)
+        return left + right
+
+    return weights(degree, 0)
+
+
+def bspline_weights(t, n_points, degree=3, closed=True):
+    # Control point indices and weights, both of shape t.shape + (degree + 1,). Closed curves wrap around,
+    # otherwise indices are clamped to the first and last point, as if those were repeated indefinitely
+    t = np.asarray(t, dtype=np.float64)
+    i = t.astype(int)
+    u = t - i
+    powers = u[...,None] ** np.arange(degree + 1)
+    weights = powers @ basis_matrix(degree).T
+    indices = i[...,None] - degree + np.arange(degree + 1)
+    if closed:
+        indices %= n_points
+    else:
+        indices = np.clip(indices, 0, n_points - 1)
+    return indices, weights
+
+
+def bspline(t, points, degree=3, closed=True):
+    # Evaluate the spline through points (n, ...) at a scalar t, giving an array of shape (...), or at an array of
+    # t, giving t.shape + (...)
+    points = np.asarray(points)
+    indices, weights = bspline_weights(t, len(points), degree, closed)
+    selected = points[indices]
+    weights = weights.reshape(weights.shape + (1,) * (selected.ndim - indices.ndim))
+    return (selected * weights).sum(axis=indices.ndim - 1)
+
+
+def bspline_matrix(t, n_points, degree=3, closed=True):
+    # Dense (len(t), n_points) matrix B so that B @ points evaluates the spline at all t in one product,
+    # worthwhile when the same parameters are used for many sets of control points
+    indices, weights = bspline_weights(np.atleast_1d(t), n_points, degree, closed)
+    B = np.zeros((len(indices), n_points))
+    np.add.at(B, (np.arange(len(indices))[:,None], indices), weights)
+    return B
+
+
+if __name__ == '__main__':
+    from geometry import de_boor, de_boor_np
+
+    # Compare against the recursive implementations
+    np.random.seed(0)
+    for degree in [2, 3, 5]:
+        points = np.random.rand(20, 2)
+        t = np.random.rand(1000) * len(points)
+        reference = np.array([de_boor(s, points, degree) for s in t])
+        print(f'degree {degree}: maximum difference to de_boor {np.abs(bspline(t, points, degree) - reference).max():.2e}, '
+              f'to de_boor_np {np.abs(bspline(t, points, degree) - de_boor_np(t, points, degree)).max():.2e}, '
+              f'matrix {np.abs(bspline_matrix(t, len(points), degree) @ points - reference).max():.2e}')
+
+    # Point cloud animation: 10000 tracks over 30 keyframes
+    coords = np.random.rand(30, 10000, 2)
+    t = 12.345
+    start = time.perf_counter()
+    reference = np.array([de_boor(t, coords[:,i,:], degree=3) for i in range(coords.shape[1])])
+    print(f'de_boor per track: {time.perf_counter() - start:.3f}s')
+    start = time.perf_counter()
+    points = bspline(t, coords, degree=3)
+    print(f'bspline for all tracks: {time.perf_counter() - start:.4f}s, maximum difference {np.abs(points - reference).max():.2e}')
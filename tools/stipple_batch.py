@@ -0,0 +1,103 @@
+import os, glob, json, time
+import argparse
+from multiprocessing import Pool
+import numpy as np
+
+from stippling import stipple_image_points
+
+
+# Stipples many images in parallel. Every result is written atomically to <output_dir>/<image name>.npy and
+# recorded in <output_dir>/manifest.json together with its timing and convergence (centroid shifts and
+# energy per iteration). Images whose .npy already exists with the same parameters are skipped, so an
+# interrupted run continues where it stopped.
+
+
+def _write_atomic(path, write):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def load_manifest(path):
+    if os.path.isfile(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def save_manifest(path, manifest):
+    _write_atomic(path, lambda f: f.write(json.dumps(manifest, indent=2, sort_keys=True).encode()))
+
+
+def points_name(path):
+    # Name under which the points of an image are stored and recorded, its file name without the extension
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _stipple_one(args):
+    image_path, output_path, params = args
+    start = time.perf_counter()
+    points, history = stipple_image_points(image_path, verbose=False, return_history=True, **params)
+    seconds = time.perf_counter() - start
+    _write_atomic(output_path, lambda f: np.save(f, points))
+    return image_path, output_path, seconds, history
+
+
+def stipple_images(image_paths, output_dir, processes=None, **params):
+    # params are passed on to stipple_image_points (n_points, max_iterations, scale_factor, invert, init_method,
+    # tolerance, energy_tolerance, pyramid_levels)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, 'manifest.json')
+    manifest = load_manifest(manifest_path)
+
+    todo = []
+    for image_path in image_paths:
+        name = points_name(image_path)
+        output_path = os.path.join(output_dir, f'{name}.npy')
+        entry = manifest.get(name)
+        if os.path.isfile(output_path) and (entry is None or entry['params'] == params):
+            continue
+        todo.append((image_path, output_path, params))
+    print(f'Stippling {len(todo)} of {len(image_paths)} images ({len(image_paths) - len(todo)} already done)')
+
+    with Pool(processes) as pool:
+        for n, (image_path, output_path, seconds, history) in enumerate(pool.imap_unordered(_stipple_one, todo)):
+            name = points_name(output_path)
+            manifest[name] = {
+                'image': image_path,
+                'params': params,
+                'seconds': round(seconds, 2),
+                'iterations': len(history['max_shift']),
+                'max_shifts': [round(d, 4) for d in history['max_shift']],
+                'mean_shifts': [round(d, 4) for d in history['mean_shift']],
+                'energies': [round(e, 4) for e in history['energy']],
+                'levels': history['levels'],
+                'finished': time.strftime('%Y-%m-%d %H:%M:%S'),
+            }
+            save_manifest(manifest_path, manifest)
+            print(f'[{n+1}/{len(todo)}] {name}: {seconds:.1f}s, {len(history["max_shift"])} iterations, '
+                  f'final maximum shift {history["max_shift"][-1] if history["max_shift"] else 0:.3f}')
+
+    return manifest
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Stipple all images matching a glob pattern in parallel')
+    parser.add_argument('pattern', help='glob pattern of input images, e.g. "species/critically endangered/*.png"')
+    parser.add_argument('output_dir', help='directory for the .npy point files and manifest.json')
+    parser.add_argument('--n-points', type=int, default=5000)
+    parser.add_argument('--max-iterations', type=int, default=50)
+    parser.add_argument('--scale-factor', type=float, default=1)
+    parser.add_argument('--invert', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.05, help='stop once the maximum centroid shift is below this')
+    parser.add_argument('--energy-tolerance', type=float, default=None, help='stop once the relative energy decrease is below this')
+    parser.add_argument('--pyramid-levels', type=int, default=1, help='coarse-to-fine levels, each halving the resolution')
+    parser.add_argument('--init-method', default='inverse_cdf', choices=['rejection', 'inverse_cdf', 'blue_noise'])
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+
+    stipple_images(sorted(glob.glob(args.pattern)), args.output_dir, processes=args.processes,
+                   n_points=args.n_points, max_iterations=args.max_iterations,
+                   scale_factor=args.scale_factor, invert=args.invert, init_method=args.init_method,
+                   tolerance=args.tolerance, energy_tolerance=args.energy_tolerance, pyramid_levels=args.pyramid_levels)
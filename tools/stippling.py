@@ -1,12 +1,15 @@
 
+import time
 import numpy as np
 import matplotlib.pyplot as plt
 from imageio import imread
 from scipy.ndimage import zoom
-from scipy.spatial import Voronoi, voronoi_plot_2d
+from scipy.spatial import Voronoi, voronoi_plot_2d, cKDTree
 from scipy.ndimage.filters import gaussian_filter
 from math import pi, ceil, sqrt
 
+from sampling import inverse_cdf_sampling, blue_noise_sampling
+
 
 def rejection_sampling(density, n_samples):
 	h, w = density.shape[:2]
@@ -146,38 +149,72 @@ def find_centroid(P, Q, region, p, attractor=None, repulsor=None):
 	return centroid, area
 
 
-def precompute_integrands(density):
-	print('Precomputing integrands...')
-	P, Q = np.zeros(density.shape), np.zeros(density.shape)
-	for i in range(P.shape[0]):
-		for j in range(P.shape[1]):
-			P[i,j] = P[i,j-1] + density[i,j]
-			Q[i,j] = Q[i,j-1] + P[i,j]
+# P holds the row-wise cumulative density, Q the row-wise cumulative sum of P. For very large density
+# images pass a directory as memmap_dir to write both to disk-backed .npy files instead of RAM.
+def precompute_integrands(density, dtype=np.float64, memmap_dir=None, verbose=True):
+	if verbose:
+		print('Precomputing integrands...')
+	if memmap_dir is None:
+		P, Q = np.empty(density.shape, dtype=dtype), np.empty(density.shape, dtype=dtype)
+	else:
+		P = np.lib.format.open_memmap(f'{memmap_dir}/P.npy', mode='w+', dtype=dtype, shape=density.shape)
+		Q = np.lib.format.open_memmap(f'{memmap_dir}/Q.npy', mode='w+', dtype=dtype, shape=density.shape)
+	np.cumsum(density, axis=1, dtype=dtype, out=P)
+	np.cumsum(P, axis=1, dtype=dtype, out=Q)
 	return P, Q
 
 
 def find_center_of_weight(P, Q):
-	denominator, Y, X = 0, 0, 0
-	for y in range(P.shape[0]):
-		denominator += P[y, -1] - P[y, 0]
-		Y += y * (P[y, -1] - P[y, 0])
-		X += (P.shape[1] - 1) * P[y, -1] - Q[y, -1]
+	row_mass = P[:,-1] - P[:,0]
+	denominator = np.sum(row_mass)
+	Y = np.sum(np.arange(P.shape[0]) * row_mass)
+	X = np.sum((P.shape[1] - 1) * P[:,-1] - Q[:,-1])
 	mid = (Y / denominator, X / denominator + 0.5)
 	return mid
 
 
-def get_initial_points(density, n_points=100, init=None):
-	if init is None:
-		samples = rejection_sampling(density, n_points)
+def resample_points(points, n_points):
+	# Thin out or split an existing stipple so it can warm start Lloyd's method with a different point count.
+	# Removed points are chosen at random. When growing, every point is split into the same number of
+	# children (plus one for a random subset to hit n_points), spread evenly on a circle with a quarter
+	# of the distance to its nearest neighbour as radius.
+	if len(points) >= n_points:
+		return points[np.sort(np.random.choice(len(points), n_points, replace=False))]
+	counts = np.full(len(points), n_points // len(points))
+	counts[np.random.choice(len(points), n_points % len(points), replace=False)] += 1
+	if len(points) > 1:
+		dists = cKDTree(points).query(points, k=2)[0][:,1]
 	else:
+		# A single point has no neighbour (the query returns inf), its children get a radius of one pixel
+		dists = np.full(1, 4.0)
+	parents = np.repeat(np.arange(len(points)), counts)
+	child_index = np.arange(n_points) - np.repeat(np.cumsum(counts) - counts, counts)
+	angles = 2*pi * child_index / counts[parents] + np.random.rand(len(points))[parents] * 2*pi
+	radii = np.where(counts[parents] > 1, 0.25 * dists[parents], 0)
+	return points[parents] + radii[:,None] * np.stack([np.sin(angles), np.cos(angles)], axis=1)
+
+
+# method is one of 'rejection', 'inverse_cdf' (same distribution, vectorized) or 'blue_noise'
+# (evenly spread, so Lloyd's method starts closer to convergence), see sampling.py
+def get_initial_points(density, n_points=100, init=None, method='inverse_cdf'):
+	if init is not None:
 		samples = [(init[i,0] / density.shape[0], init[i,1] / density.shape[1]) for i in range(init.shape[0])]
+	elif method == 'rejection':
+		samples = rejection_sampling(density, n_points)
+	elif method == 'inverse_cdf':
+		samples = list(inverse_cdf_sampling(density, n_points))
+	elif method == 'blue_noise':
+		samples = list(blue_noise_sampling(density, n_points))
+	else:
+		raise ValueError(f'Unknown sampling method {method}')
 	# Additional outside points to get finite Voronoi regions inside the image
 	samples.extend([(-1., -1.), (-1., 2.), (2., -1.), (2., 2.)])
 	points = np.array(samples) * density.shape
 	return points
 
 
-def lloyds_method(points, P, Q, clip_polygon, max_iterations, attractors=None, repulsor=None, verbose=True):
+# Original per-region implementation, kept for reference comparisons with lloyds_method
+def lloyds_method_polygons(points, P, Q, clip_polygon, max_iterations, attractors=None, repulsor=None, verbose=True):
 	if verbose:
 		print('Generating centroidal voronoi diagram...')
 	it, max_d, std_prev, std_diff = 0, P.shape[0], 1, 1
@@ -200,7 +237,7 @@ def lloyds_method(points, P, Q, clip_polygon, max_iterations, attractors=None, r
 				centroid, area = find_centroid(P, Q, region, points[i,:])
 			else:
 				centroid, area = find_centroid(P, Q, region, points[i,:], attractor=attractors[i,:], repulsor=repulsor)
-			max_d = max(max_d, sqrt((points[i,0] - centroid[0])**2 + (points[i,0] - centroid[0])**2))
+			max_d = max(max_d, sqrt((points[i,0] - centroid[0])**2 + (points[i,1] - centroid[1])**2))
 			# areas.append(area / (P.shape[0] * P.shape[1]))
 			points[i,:] = centroid
 
@@ -211,9 +248,93 @@ def lloyds_method(points, P, Q, clip_polygon, max_iterations, attractors=None, r
 			print(f'Iteration {it: 4}: maximum centroid shift = {round(max_d, 2)}')
 
 
+def move_empty_cells(points, mass, centroids, shape, attractors=None, repulsor=None):
+	# Same heuristic as find_centroid: cells without enough probability mass take a small step towards
+	# their attractor (default image center) or away from the repulsor. As in lloyds_method_polygons, the
+	# repulsor only applies together with attractors
+	empty = mass < 0.01
+	if not np.any(empty):
+		return
+	step_size = shape[0] * 0.002
+	p = points[empty]
+	if attractors is None:
+		direction = np.array(shape) * 0.5 - p
+	elif repulsor is not None:
+		direction = p - repulsor
+	else:
+		direction = attractors[empty] - p
+	direction_norm = np.sqrt(np.sum(np.square(direction), axis=1))[:,None]
+	centroids[empty] = p + direction * (step_size / np.maximum(direction_norm, 1e-12))
+
+
+def has_converged(history, tolerance=0.05, mean_tolerance=None, energy_tolerance=None):
+	if history['max_shift'][-1] <= tolerance:
+		return True
+	if mean_tolerance is not None and history['mean_shift'][-1] <= mean_tolerance:
+		return True
+	if energy_tolerance is not None and len(history['energy']) > 1:
+		# Only a small decrease counts, the energy can rise e.g. after empty cells were moved
+		previous, current = history['energy'][-2:]
+		return 0 <= previous - current <= energy_tolerance * previous
+	return False
+
+
+def lloyds_method(points, P, Q, clip_polygon, max_iterations, attractors=None, repulsor=None, verbose=True,
+                  tolerance=0.05, mean_tolerance=None, energy_tolerance=None):
+	# Instead of clipping and integrating every Voronoi region, label each pixel with its nearest
+	# generator and compute all density weighted centroids at once with bincount.
+	# clip_polygon is implied by the pixel grid and only kept for compatibility with lloyds_method_polygons.
+	# Stops after max_iterations, or once the maximum centroid shift drops below tolerance, the mean shift
+	# below mean_tolerance, or the relative decrease of the CVT energy (density weighted mean squared
+	# distance of pixels to their generator) below energy_tolerance. Returns the history of these values.
+	if verbose:
+		print('Generating centroidal voronoi diagram...')
+	density = np.diff(P, axis=1, prepend=0).ravel()
+	h, w = P.shape
+	yy, xx = np.divmod(np.flatnonzero(density > 0), w)
+	weights = density[density > 0]
+	pixels = np.stack([yy, xx], axis=1).astype(np.float64)
+	weighted_y, weighted_x = weights * yy, weights * xx
+
+	n = len(points) - 4
+	history = {'max_shift': [], 'mean_shift': [], 'energy': []}
+	for it in range(1, max_iterations + 1):
+		dists, labels = cKDTree(points[:n]).query(pixels, workers=-1)
+
+		mass = np.bincount(labels, weights=weights, minlength=n)
+		centroids = np.stack([np.bincount(labels, weights=weighted_y, minlength=n),
+		                      np.bincount(labels, weights=weighted_x, minlength=n)], axis=1) / np.maximum(mass, 1e-12)[:,None]
+		move_empty_cells(points[:n], mass, centroids, P.shape, attractors, repulsor)
+
+		shifts = np.sqrt(np.sum(np.square(centroids - points[:n]), axis=1))
+		points[:n] = centroids
+		history['max_shift'].append(float(np.max(shifts)))
+		history['mean_shift'].append(float(np.mean(shifts)))
+		history['energy'].append(float(np.sum(weights * np.square(dists)) / np.sum(weights)))
+
+		if verbose:
+			print(f'Iteration {it: 4}: maximum centroid shift = {round(history["max_shift"][-1], 2)}, '
+			      f'mean shift = {round(history["mean_shift"][-1], 3)}, energy = {round(history["energy"][-1], 3)}')
+		if has_converged(history, tolerance, mean_tolerance, energy_tolerance):
+			break
+
+	return history
+
+
+pyramid_energy_tolerance = 1e-3
+
+def pyramid_iterations(max_iterations, factor, pyramid_levels):
+	# Iteration budget of the pyramid level downsampled by factor: max_iterations on the coarsest level,
+	# halved on every finer one
+	return max(1, int(max_iterations * factor / 2**(pyramid_levels - 1)))
+
+
 # Following http://mrl.nyu.edu/~ajsecord/npar2002/npar2002_ajsecord_preprint.pdf
-def stipple_image_points(input_image_path, n_points=5000, max_iterations=50, init=None, scale_factor=1, invert=False, attractors=None, repulsor=None):
-	print('GENERATING STIPPLE IMAGE')
+def stipple_image_points(input_image_path, n_points=5000, max_iterations=50, init=None, scale_factor=1, invert=False, attractors=None, repulsor=None,
+                         init_method='inverse_cdf', verbose=True, return_history=False, tolerance=0.05, mean_tolerance=None, energy_tolerance=None,
+                         pyramid_levels=1):
+	if verbose:
+		print('GENERATING STIPPLE IMAGE')
 
 	# Read density from image file
 	density = imread(input_image_path, mode='F') / 255
@@ -222,11 +343,52 @@ def stipple_image_points(input_image_path, n_points=5000, max_iterations=50, ini
 	if scale_factor != 1:
 		density = zoom(density, zoom=scale_factor, order=2, mode='mirror')
 
+	# Pyramid mode: stipple densities downsampled by 2, 4, ... with proportionally fewer points first,
+	# then split the points and refine on the next finer level. Iterations get more expensive on finer
+	# levels and are needed less there, so the coarsest level may use max_iterations and every finer one
+	# half as many as the previous one. Levels also stop once the energy decreases by less than a fraction
+	# pyramid_energy_tolerance of itself per iteration, unless an energy_tolerance is given.
+	# The warm start of the full level (init or the points of the last pyramid level) is resampled to n_points
+	# once, below
+	levels = []
+	warm_start = None
+	if init is not None:
+		# Warm start from a previous result for the same image (and scale_factor), with any number of points
+		warm_start = np.asarray(init, dtype=np.float64)[:, ::-1]
+	elif pyramid_levels > 1:
+		full_shape = np.array(density.shape)
+		if energy_tolerance is None:
+			energy_tolerance = pyramid_energy_tolerance
+		for factor in [2**level for level in range(pyramid_levels - 1, 0, -1)]:
+			start = time.perf_counter()
+			coarse = zoom(density, zoom=1/factor, order=1, mode='mirror')
+			scale = np.array(coarse.shape) / full_shape
+			n_coarse = max(1, n_points // factor**2)
+			# The coarsest level starts from scratch, the others from the points of the previous level
+			coarse_init = None
+			if warm_start is not None:
+				coarse_init = np.clip(resample_points(warm_start * scale, n_coarse), 0, np.array(coarse.shape) - 1)
+			coarse_points = get_initial_points(coarse, n_points=n_coarse, init=coarse_init, method=init_method)
+			P, Q = precompute_integrands(coarse, verbose=False)
+			coarse_history = lloyds_method(coarse_points, P, Q, None, pyramid_iterations(max_iterations, factor, pyramid_levels), verbose=False,
+			                               repulsor=None if repulsor is None else np.asarray(repulsor) * scale,
+			                               tolerance=tolerance / factor, mean_tolerance=mean_tolerance, energy_tolerance=energy_tolerance)
+			warm_start = coarse_points[:-4] / scale
+			levels.append({'shape': list(coarse.shape), 'n_points': n_coarse,
+			               'iterations': len(coarse_history['energy']), 'seconds': round(time.perf_counter() - start, 2)})
+			if verbose:
+				print(f'Pyramid level {coarse.shape[0]}x{coarse.shape[1]}: {n_coarse} points, '
+				      f'{levels[-1]["iterations"]} iterations, {levels[-1]["seconds"]}s')
+		max_iterations = pyramid_iterations(max_iterations, 1, pyramid_levels)
+
 	# Precompute stuff
-	P, Q = precompute_integrands(density)
+	start = time.perf_counter()
+	P, Q = precompute_integrands(density, verbose=verbose)
 	mid = find_center_of_weight(P, Q)
 	clip_polygon = ((0, 0), (P.shape[0] - 1, 0), (P.shape[0] - 1, P.shape[1] - 1), (0, P.shape[1] - 1))
-	points = get_initial_points(density, n_points=n_points, init=init)
+	if warm_start is not None:
+		init = np.clip(resample_points(warm_start, n_points), 0, np.array(density.shape) - 1)
+	points = get_initial_points(density, n_points=n_points, init=init, method=init_method)
 
 	# # Get attractors
 	# print 'placing attractors...'
@@ -243,10 +405,52 @@ def stipple_image_points(input_image_path, n_points=5000, max_iterations=50, ini
 	# 			attractors[i,:] = points_sparse[j,:]
 
 	# Distribute points
-	lloyds_method(points, P, Q, clip_polygon, max_iterations, attractors=attractors, repulsor=repulsor)
+	history = lloyds_method(points, P, Q, clip_polygon, max_iterations, attractors=attractors, repulsor=repulsor, verbose=verbose,
+	                        tolerance=tolerance, mean_tolerance=mean_tolerance, energy_tolerance=energy_tolerance)
 
 	# # Show Voronoi plot
 	# voronoi_plot_2d(v)
 	# plt.show()
 
+	levels.append({'shape': list(density.shape), 'n_points': n_points,
+	               'iterations': len(history['energy']), 'seconds': round(time.perf_counter() - start, 2)})
+	if verbose and len(levels) > 1:
+		print(f'Pyramid level {density.shape[0]}x{density.shape[1]}: {n_points} points, '
+		      f'{levels[-1]["iterations"]} iterations, {levels[-1]["seconds"]}s')
+	history['levels'] = levels
+
+	if return_history:
+		return points[:-4, ::-1], history
 	return points[:-4, ::-1]
+
+
+if __name__ == '__main__':
+	# Benchmark integrand precomputation on the images stippled by the voronoi_stippling and tsp_art pieces
+	import glob, time
+
+	def precompute_integrands_loop(density):
+		P, Q = np.zeros(density.shape), np.zeros(density.shape)
+		for i in range(P.shape[0]):
+			for j in range(P.shape[1]):
+				P[i,j] = P[i,j-1] + density[i,j]
+				Q[i,j] = Q[i,j-1] + P[i,j]
+		return P, Q
+
+	paths = sorted(glob.glob('../pieces/voronoi_stippling/**/*.png', recursive=True) + glob.glob('../pieces/tsp_art/*.png'))
+	for path in paths:
+		density = zoom(imread(path, mode='F') / 255, zoom=2, order=2, mode='mirror')
+
+		start = time.perf_counter()
+		P_loop, Q_loop = precompute_integrands_loop(density)
+		t_loop = time.perf_counter() - start
+
+		timings, errors = [], []
+		for dtype in [np.float64, np.float32]:
+			start = time.perf_counter()
+			P, Q = precompute_integrands(density, dtype=dtype)
+			mid = find_center_of_weight(P, Q)
+			timings.append(time.perf_counter() - start)
+			errors.append(np.max(np.abs(Q - Q_loop)) / np.max(Q_loop))
+
+		print(f'{path:60} {density.shape[0]:5}x{density.shape[1]:<5}  loop {t_loop:7.2f}s   cumsum {timings[0]:.4f}s   '
+		      f'float32 {timings[1]:.4f}s   speedup {t_loop / timings[0]:.0f}x   relative error float64 {errors[0]:.0e} float32 {errors[1]:.0e}')
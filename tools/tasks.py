@@ -0,0 +1,195 @@
+import os, json, time
+import hashlib
+import inspect
+from multiprocessing import Pool
+
+
+# Make-like runner for the preparation steps of a piece (draw shape -> stipple -> solve TSP -> keyframes).
+# Each step declares the files it reads and writes:
+#
+#   @task(inputs=['eye_shape.png'], outputs=['eye_stippled.npy'])
+#   def stipple_image():
+#       ...
+#
+#   if __name__ == '__main__':
+#       run_tasks()
+#
+# A step is rerun only when its source code, its parameters or the content of one of its inputs changed, or when
+# one of its outputs is missing or was modified. Outputs that already exist when a step is first seen are kept.
+# Steps whose inputs do not depend on each other run in parallel. The hashes are kept in .tasks.json next to the
+# piece. Decorated functions can still be called directly.
+
+registered_tasks = []
+state_path = '.tasks.json'
+
+
+class Task():
+    def __init__(self, function, inputs=(), outputs=(), params=None):
+        self.function = function
+        self.name = function.__name__
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = params or {}
+
+
+def task(inputs=(), outputs=(), **params):
+    # params are passed to the function as keyword arguments and are part of its hash
+    def decorator(function):
+        registered_tasks.append(Task(function, inputs, outputs, params))
+        return function
+    return decorator
+
+
+def load_state():
+    if os.path.isfile(state_path):
+        with open(state_path) as f:
+            return json.load(f)
+    return {'tasks': {}, 'files': {}}
+
+
+def save_state(state):
+    tmp_path = f'{state_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, state_path)
+
+
+def file_hash(path, state):
+    # Content hash, reused as long as size and modification time are unchanged
+    stat = os.stat(path)
+    known = state['files'].get(path)
+    if known is not None and known['size'] == stat.st_size and known['mtime'] == stat.st_mtime:
+        return known['hash']
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    state['files'][path] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'hash': sha.hexdigest()}
+    return sha.hexdigest()
+
+
+def task_hash(t, state):
+    sha = hashlib.sha1()
+    sha.update(inspect.getsource(t.function).encode())
+    sha.update(json.dumps(t.params, sort_keys=True, default=repr).encode())
+    for path in t.inputs:
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f'Input {path} of task {t.name} does not exist and no task creates it')
+        sha.update(path.encode())
+        sha.update(file_hash(path, state).encode())
+    return sha.hexdigest()
+
+
+def is_stale(t, state):
+    known = state['tasks'].get(t.name)
+    if known is None:
+        # Outputs created before the task was tracked are adopted as they are
+        return not t.outputs or not all(os.path.isfile(path) for path in t.outputs)
+    if known['hash'] != task_hash(t, state):
+        return True
+    for path in t.outputs:
+        if not os.path.isfile(path) or file_hash(path, state) != known['outputs'].get(path):
+            return True
+    return False
+
+
+def get_dependencies(tasks):
+    producers = {}
+    for t in tasks:
+        for path in t.outputs:
+            if path in producers:
+                raise ValueError(f'{path} is created by both {producers[path].name} and {t.name}')
+            producers[path] = t
+    return {t.name: set(producers[path].name for path in t.inputs if path in producers) for t in tasks}
+
+
+def record(t, state, seconds=None):
+    state['tasks'][t.name] = {
+        'hash': task_hash(t, state),
+        'outputs': {path: file_hash(path, state) for path in t.outputs},
+        'seconds': None if seconds is None else round(seconds, 2),
+        'finished': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    save_state(state)
+
+
+def _run_task(function, params):
+    start = time.perf_counter()
+    function(**params)
+    return time.perf_counter() - start
+
+
+def run_tasks(targets=None, force=(), tasks=None, processes=None, dry_run=False):
+    # Bring targets (names of tasks, default all) and everything they depend on up to date. force names tasks
+    # to rerun regardless of their state. With dry_run=True only print which tasks would run
+    tasks = registered_tasks if tasks is None else tasks
+    by_name = {t.name: t for t in tasks}
+    dependencies = get_dependencies(tasks)
+
+    needed = set(by_name if targets is None else targets)
+    stack = list(needed)
+    while stack:
+        for name in dependencies[stack.pop()]:
+            if name not in needed:
+                needed.add(name)
+                stack.append(name)
+
+    state = load_state()
+    pending = [t for t in tasks if t.name in needed]
+    done, rerun, running = set(), set(), {}
+    pool = Pool(processes) if processes != 1 and not dry_run else None
+    try:
+        while pending or running:
+            # Start every task whose dependencies are finished. Skipping a task can make others ready
+            ready = [t for t in pending if dependencies[t.name] <= done]
+            while ready:
+                t = ready.pop(0)
+                pending.remove(t)
+                upstream_rerun = bool(dependencies[t.name] & rerun)
+                if dry_run:
+                    stale = t.name in force or upstream_rerun or is_stale(t, state)
+                else:
+                    untracked = t.name not in state['tasks']
+                    stale = t.name in force or is_stale(t, state) or (upstream_rerun and untracked)
+                if stale:
+                    rerun.add(t.name)
+                if not stale or dry_run:
+                    print(f'{t.name}: {"would run" if stale else "up to date"}')
+                    if not stale and not dry_run and t.name not in state['tasks']:
+                        record(t, state)
+                    done.add(t.name)
+                    ready = [t for t in pending if dependencies[t.name] <= done]
+                    continue
+
+                print(f'{t.name}: running')
+                if pool is None:
+                    running[t.name] = (t, None, _run_task(t.function, t.params))
+                else:
+                    running[t.name] = (t, pool.apply_async(_run_task, (t.function, t.params)), None)
+
+            if not running:
+                if pending:
+                    raise ValueError(f'Circular dependencies between {", ".join(t.name for t in pending)}')
+                break
+
+            # Record finished tasks
+            finished = [name for name, (_, result, _) in running.items() if result is None or result.ready()]
+            if not finished:
+                time.sleep(0.1)
+                continue
+            for name in finished:
+                t, result, seconds = running.pop(name)
+                if result is not None:
+                    seconds = result.get()
+                for path in t.outputs:
+                    if not os.path.isfile(path):
+                        raise FileNotFoundError(f'Task {t.name} did not create its output {path}')
+                record(t, state, seconds)
+                print(f'{t.name}: finished in {seconds:.1f}s')
+                done.add(name)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    return rerun